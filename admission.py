@@ -0,0 +1,83 @@
+"""Admission control: per-client token buckets and a global in-flight limit.
+
+Both checks are O(1) and run before a request does any logging or
+rendering, so a burst from one client or a scraper is turned away with a
+cheap 429 (client over its rate) or 503 (process at its in-flight limit)
+instead of queueing behind the worker threads.
+"""
+import threading
+import time
+from collections import OrderedDict
+
+
+def client_key(request, trusted_proxies=1):
+    """Client address of ``request`` as seen by the last ``trusted_proxies`` hops.
+
+    Proxies append the address they saw to X-Forwarded-For, so with one
+    trusted proxy (Cloud Run's front end) the last entry is the real client
+    and anything before it may be spoofed.
+    """
+    route = request.access_route
+    if trusted_proxies > 0 and len(route) >= trusted_proxies:
+        return route[-trusted_proxies]
+    return route[0] if route else (request.remote_addr or '')
+
+
+class TokenBuckets:
+    """A token bucket per key refilling at ``rate`` per second up to ``burst``.
+
+    At most ``max_keys`` buckets are kept; the least recently seen key is
+    evicted first.  An evicted client simply starts again with a full bucket.
+    """
+
+    def __init__(self, rate, burst, max_keys=10000):
+        self.rate = rate
+        self.burst = max(1.0, burst)
+        self.max_keys = max_keys
+        self._buckets = OrderedDict()
+        self._lock = threading.Lock()
+
+    def take(self, key, now=None):
+        """Take a token for ``key``; returns 0.0 if admitted, else seconds until one is available"""
+        now = time.monotonic() if now is None else now
+        with self._lock:
+            bucket = self._buckets.get(key)
+            if bucket is None:
+                bucket = self._buckets[key] = [self.burst, now]
+                if len(self._buckets) > self.max_keys:
+                    self._buckets.popitem(last=False)
+            else:
+                self._buckets.move_to_end(key)
+                bucket[0] = min(self.burst, bucket[0] + (now - bucket[1]) * self.rate)
+                bucket[1] = now
+            if bucket[0] >= 1.0:
+                bucket[0] -= 1.0
+                return 0.0
+            return (1.0 - bucket[0]) / self.rate
+
+    def tracked(self):
+        """Number of keys currently holding a bucket"""
+        return len(self._buckets)
+
+
+class InFlightLimit:
+    """Non-blocking cap on the number of requests being handled at once"""
+
+    def __init__(self, limit):
+        self.limit = limit
+        self._count = 0
+        self._lock = threading.Lock()
+
+    def try_acquire(self):
+        with self._lock:
+            if self._count >= self.limit:
+                return False
+            self._count += 1
+            return True
+
+    def release(self):
+        with self._lock:
+            self._count -= 1
+
+    def current(self):
+        return self._count
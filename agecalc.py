@@ -0,0 +1,197 @@
+"""Age calculation shared by the page, the JSON API and the command line tools."""
+import threading
+from array import array
+from calendar import isleap, monthrange
+from datetime import date, datetime, timedelta
+from functools import lru_cache
+
+# numpy is optional and only used for batches, so it is imported on first
+# use rather than on every cold start; without it batches use a Python loop
+np = None
+_numpy_checked = False
+
+
+def load_numpy():
+    """The numpy module, imported on first call, or None if it is not installed"""
+    global np, _numpy_checked
+    if not _numpy_checked:
+        try:
+            import numpy
+            np = numpy
+        except ImportError:
+            pass
+        _numpy_checked = True
+    return np
+
+# Ages above this are answered with a joke on the page
+MAX_AGE = 125
+WEEKDAYS = ['Monday', 'Tuesday', 'Wednesday', 'Thursday', 'Friday', 'Saturday', 'Sunday']
+
+
+def parse_birthdate(birthdate):
+    """Parse a ``YYYY-MM-DD`` birthdate, raising ValueError if it is not one"""
+    if not isinstance(birthdate, str):
+        raise ValueError("birthdate must be a string in YYYY-MM-DD format")
+    return datetime.strptime(birthdate, '%Y-%m-%d').date()
+
+
+def calculate_age(bdate, today=None):
+    """Completed years between ``bdate`` and ``today``"""
+    today = today or date.today()
+    return today.year - bdate.year - ((today.month, today.day) < (bdate.month, bdate.day))
+
+
+def days_until_birthday(bdate, today=None):
+    """Days from ``today`` until the next birthday (0 on the day itself).
+
+    A Feb 29 birthday falls on Mar 1 in common years, the day the age
+    rule in calculate_age() counts the year as completed.
+    """
+    today = today or date.today()
+    for year in (today.year, today.year + 1):
+        try:
+            birthday = date(year, bdate.month, bdate.day)
+        except ValueError:
+            birthday = date(year, 3, 1)
+        if birthday >= today:
+            return (birthday - today).days
+
+
+class CalendarTable:
+    """Age, days until next birthday and weekday for every date the form offers.
+
+    Covers Jan 1 of ``today.year - MAX_AGE`` through Dec 31 of ``today.year``
+    (about 46k days), so a canonical ``YYYY-MM-DD`` birthdate in that window
+    is answered with a dict lookup and array indexing instead of strptime.
+    """
+
+    def __init__(self, today):
+        self.today = today
+        self.first = date(today.year - MAX_AGE, 1, 1)
+        last = date(today.year, 12, 31)
+        size = (last - self.first).days + 1
+        self.index = {}
+        self.ages = array('i', bytes(4 * size))
+        self.days_until = array('H', bytes(2 * size))
+        self.weekdays = array('B', bytes(size))
+        # Built on the cold-start path, so walk year/month/day with precomputed
+        # per-(month, day) values instead of date arithmetic for every day
+        leap_year = date(2000, 1, 1)
+        month_days = [[(m, d, days_until_birthday(leap_year.replace(month=m, day=d), today),
+                        (today.month, today.day) < (m, d), f"-{m:02d}-{d:02d}")
+                       for d in range(1, monthrange(2000, m)[1] + 1)] for m in range(1, 13)]
+        first_weekday = self.first.weekday()
+        index, ages, days_until, weekdays = self.index, self.ages, self.days_until, self.weekdays
+        i = 0
+        for year in range(self.first.year, today.year + 1):
+            prefix = f"{year:04d}"
+            age = today.year - year
+            leap = isleap(year)
+            for days in month_days:
+                for m, d, until, before, suffix in days:
+                    if d == 29 and m == 2 and not leap:
+                        continue
+                    index[prefix + suffix] = i
+                    ages[i] = age - before
+                    days_until[i] = until
+                    weekdays[i] = (first_weekday + i) % 7
+                    i += 1
+
+    def lookup(self, birthdate):
+        """Table index of a canonical birthdate string, or None if it is not in the table"""
+        return self.index.get(birthdate) if isinstance(birthdate, str) else None
+
+    def result(self, i, birthdate):
+        age = self.ages[i]
+        return {'birthdate': birthdate, 'age': age, 'over_max_age': age > MAX_AGE,
+                'days_until_birthday': self.days_until[i], 'weekday': WEEKDAYS[self.weekdays[i]],
+                'error': None}
+
+
+@lru_cache(maxsize=4)
+def calendar_table(today):
+    """The CalendarTable for ``today``, built once per day"""
+    return CalendarTable(today)
+
+
+def current_table():
+    """Today's table; a new one is built on the first use after local midnight"""
+    return calendar_table(date.today())
+
+
+def schedule_midnight_rebuild():
+    """Build each day's table just after local midnight, off the request path"""
+    now = datetime.now()
+    midnight = datetime.combine(now.date() + timedelta(days=1), datetime.min.time())
+    timer = threading.Timer((midnight - now).total_seconds() + 1, _rebuild_at_midnight)
+    timer.daemon = True
+    timer.start()
+
+
+def _rebuild_at_midnight():
+    current_table()
+    schedule_midnight_rebuild()
+
+
+def age_result(birthdate, today=None):
+    """Result record for one birthdate: its age, whether it is over MAX_AGE,
+    days until the next birthday and weekday of birth, or an error"""
+    table = calendar_table(today) if today else current_table()
+    i = table.lookup(birthdate)
+    if i is not None:
+        return table.result(i, birthdate)
+    try:
+        bdate = parse_birthdate(birthdate)
+    except ValueError as e:
+        return {'birthdate': birthdate, 'age': None, 'over_max_age': False,
+                'days_until_birthday': None, 'weekday': None, 'error': str(e)}
+    age = calculate_age(bdate, table.today)
+    return {'birthdate': birthdate, 'age': age, 'over_max_age': age > MAX_AGE,
+            'days_until_birthday': days_until_birthday(bdate, table.today),
+            'weekday': WEEKDAYS[bdate.weekday()], 'error': None}
+
+
+def batch_age_results(birthdates, today=None):
+    """Result records for many birthdates, in input order"""
+    table = calendar_table(today) if today else current_table()
+    if not birthdates or load_numpy() is None:
+        return [age_result(b, table.today) for b in birthdates]
+    indices = vectorized_table_indices(birthdates, table)
+    results = []
+    for i, birthdate in zip(indices.tolist(), birthdates):
+        if i >= 0:
+            results.append(table.result(i, birthdate))
+        else:
+            # Dates outside the table, non-canonical spellings strptime still
+            # accepts (e.g. 1990-5-1) and real errors take the scalar path
+            results.append(age_result(birthdate, table.today))
+    return results
+
+
+def vectorized_table_indices(birthdates, table):
+    """CalendarTable indices of canonical ``YYYY-MM-DD`` strings as one array operation.
+
+    Entries that are not a real calendar date in exactly that form, or fall
+    outside the table, get -1.
+    """
+    np = load_numpy()
+    strings = np.array([b if isinstance(b, str) and len(b) == 10 else '' for b in birthdates], dtype='U10')
+    codes = strings.view(np.uint32).reshape(len(strings), 10).astype(np.int64)
+    digits = codes - ord('0')
+    digit_positions = [0, 1, 2, 3, 5, 6, 8, 9]
+    valid = ((digits[:, digit_positions] >= 0) & (digits[:, digit_positions] <= 9)).all(axis=1)
+    valid &= (codes[:, 4] == ord('-')) & (codes[:, 7] == ord('-'))
+
+    year = digits[:, 0] * 1000 + digits[:, 1] * 100 + digits[:, 2] * 10 + digits[:, 3]
+    month = digits[:, 5] * 10 + digits[:, 6]
+    day = digits[:, 8] * 10 + digits[:, 9]
+
+    # Day offsets via datetime64 month arithmetic (handles month lengths and leap years)
+    month_start = ((np.clip(year, 1, 9999) - 1970) * 12 + np.clip(month, 1, 12) - 1).astype('datetime64[M]')
+    month_start_day = month_start.astype('datetime64[D]')
+    month_length = ((month_start + 1).astype('datetime64[D]') - month_start_day).astype(np.int64)
+    valid &= (year >= 1) & (month >= 1) & (month <= 12) & (day >= 1) & (day <= month_length)
+
+    offset = (month_start_day - np.datetime64(table.first, 'D')).astype(np.int64) + day - 1
+    valid &= (offset >= 0) & (offset < len(table.ages))
+    return np.where(valid, offset, -1)
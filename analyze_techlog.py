@@ -0,0 +1,171 @@
+"""Streaming analytics over the NDJSON technical log.
+
+The file is memory-mapped and split on line boundaries into chunks that a
+process pool scans in parallel.  Lines are not parsed as JSON: the timestamp
+and only the fields being grouped on are sliced out of the raw bytes, so
+multi-GB logs are processed in bounded memory.  Works with both the flat
+records written today and the older nested ones.  Worker shards, their
+``.gz`` segments and columnar logs are not read directly: merge them with
+``merge_logs.py`` first.
+
+    python analyze_techlog.py log/techx.json --by minute
+    python analyze_techlog.py log/techx.json --by user-agent --by mobile --top 5
+    python analyze_techlog.py log/techx.json --since 2025-08-01T14:00 --until 2025-08-01T15:00 --by xff
+"""
+import argparse
+import glob
+import json
+import mmap
+import os
+import sys
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+
+TIMESTAMP_KEY = b'"timestamp":"'
+
+# Group-by name -> (JSON key searched for in the raw line, how to derive the group)
+GROUPS = {
+    'minute': (None, lambda ts: ts[:16]),
+    'hour': (None, lambda ts: ts[:13]),
+    'day': (None, lambda ts: ts[:10]),
+    'method': (b'"method":"', None),
+    'path': (b'"path":"', None),
+    'user-agent': (b'"User-Agent":"', None),
+    'mobile': (b'"Sec-Ch-Ua-Mobile":"', None),
+    'platform': (b'"Sec-Ch-Ua-Platform":"', None),
+    'xff': (b'"X-Forwarded-For":"', lambda value: value.split(',')[0].strip()),
+}
+
+
+def string_value(line, key):
+    """Value of the first ``"key":"..."`` in a raw JSON line, or None"""
+    start = line.find(key)
+    if start < 0:
+        return None
+    start += len(key)
+    end = line.find(b'"', start)
+    while end > 0 and line[end - 1] == 0x5c:  # escaped quote: decode it properly
+        end = line.find(b'"', end + 1)
+    if end < 0:
+        return None
+    raw = line[start:end]
+    if b'\\' in raw:
+        try:
+            return json.loads(b'"' + raw + b'"')
+        except ValueError:
+            pass
+    return raw.decode('utf-8', 'replace')
+
+
+def chunk_bounds(path, chunks):
+    """Split the file into about ``chunks`` byte ranges that end on line boundaries"""
+    size = os.path.getsize(path)
+    if size == 0:
+        return []
+    step = max(1, size // chunks)
+    bounds = []
+    with open(path, 'rb') as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+        start = 0
+        while start < size:
+            end = mm.find(b'\n', min(start + step, size - 1))
+            end = size if end < 0 else end + 1
+            bounds.append((start, end))
+            start = end
+    return bounds
+
+
+def scan_chunk(path, start, end, since, until, groups):
+    """Worker: count matching lines in ``[start, end)`` per requested group"""
+    counters = {name: Counter() for name in groups}
+    matched = 0
+    with open(path, 'rb') as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+        pos = start
+        while pos < end:
+            newline = mm.find(b'\n', pos, end)
+            stop = end if newline < 0 else newline
+            line = mm[pos:stop]
+            pos = stop + 1
+            ts = string_value(line, TIMESTAMP_KEY)
+            if ts is None or (since and ts < since) or (until and ts >= until):
+                continue
+            matched += 1
+            for name in groups:
+                key, derive = GROUPS[name]
+                value = ts if key is None else string_value(line, key)
+                if value is not None and derive is not None:
+                    value = derive(value)
+                counters[name][value] += 1
+    return matched, counters
+
+
+def analyze(path, since=None, until=None, groups=(), workers=1):
+    """Total matching lines and merged per-group Counters for the whole file"""
+    bounds = chunk_bounds(path, max(1, workers) * 8)
+    total = 0
+    merged = {name: Counter() for name in groups}
+
+    def merge(result):
+        nonlocal total
+        matched, counters = result
+        total += matched
+        for name, counter in counters.items():
+            merged[name].update(counter)
+
+    if workers <= 1:
+        for start, end in bounds:
+            merge(scan_chunk(path, start, end, since, until, groups))
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            futures = [pool.submit(scan_chunk, path, start, end, since, until, groups) for start, end in bounds]
+            for future in futures:
+                merge(future.result())
+    return total, merged
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split('\n', 1)[0])
+    parser.add_argument('path', nargs='?', default=os.path.join('log', 'techx.json'))
+    parser.add_argument('--since', help='first timestamp to include (ISO prefix, e.g. 2025-08-01T14:00)')
+    parser.add_argument('--until', help='timestamp to stop before (ISO prefix)')
+    parser.add_argument('--by', action='append', choices=sorted(GROUPS), default=[],
+                        help='group-by dimension; may be repeated')
+    parser.add_argument('--top', type=int, default=10, help='rows per group (0 for all)')
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1)
+    parser.add_argument('--json', action='store_true', help='print results as JSON')
+    args = parser.parse_args(argv)
+    name = os.path.basename(args.path)
+    if '.cols' in name or name.endswith('.gz'):
+        parser.error(f'{name} is not plain NDJSON; merge shards and their rotated segments first with '
+                     '"python merge_logs.py --kind technical --output FILE"')
+    if name == 'techx.json':
+        unmerged = glob.glob(os.path.join(glob.escape(os.path.dirname(args.path)), 'techx-*'))
+        if unmerged:
+            print(f"warning: {len(unmerged)} worker shard files next to {args.path} are not included; "
+                  "run merge_logs.py --compact or analyze merge_logs.py --kind technical output",
+                  file=sys.stderr)
+
+    total, counters = analyze(args.path, args.since, args.until, args.by, args.workers)
+    time_groups = {'minute', 'hour', 'day'}
+    report = {'requests': total, 'groups': {}}
+    for name, counter in counters.items():
+        if name in time_groups:
+            rows = sorted(counter.items(), key=lambda item: item[0] or '')
+            rows = rows[-args.top:] if args.top else rows
+        else:
+            rows = counter.most_common(args.top or None)
+        report['groups'][name] = [{'value': v, 'count': c, 'share': round(c / total, 4) if total else 0.0}
+                                  for v, c in rows]
+
+    if args.json:
+        print(json.dumps(report, indent=2))
+        return 0
+    print(f"{total} requests")
+    for name, rows in report['groups'].items():
+        print(f"\n{name}:")
+        for row in rows:
+            print(f"  {row['count']:>10}  {row['share']:>7.2%}  {row['value']}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -1,133 +1,320 @@
-from flask import Flask, render_template_string, request
-from datetime import datetime
+# Created before the other imports so their cost shows up in the startup report
+from startup import StartupTimer
+STARTUP = StartupTimer()
+
+from flask import Flask, g, jsonify, request, stream_with_context
+from datetime import datetime, timezone
+from werkzeug.exceptions import HTTPException, MethodNotAllowed
+import gzip
+import hashlib
+import hmac
 import json
 import os
 import logging
+import random
+import time
 from collections import deque
+from itertools import islice
+
+import assets
+import metrics
+from admission import InFlightLimit, TokenBuckets, client_key
+from birthstats import BirthStatsStore
+from columnar_log import ColumnarFileSink
+from compression import ResponseCompressor
+from agecalc import age_result, batch_age_results, current_table, schedule_midnight_rebuild
+from log_sinks import MemoryRingSink, RotatingCompressedFileSink, StdoutSink
+from log_writer import LogWriter
+from memwatch import LEVELS, MemoryWatchdog, directory_bytes, parse_thresholds
+from profiler import SampledProfiler, StackSampler
+from techlog import TechnicalCapture, parse_sample_rates
+from usage_log import UsageLog, query as query_usage, shard_path
 
-app = Flask(__name__)
+app = Flask(__name__, static_folder=None)
+# Keep JSON keys in the order they are built (months, weekdays, result fields)
+app.json.sort_keys = False
+STARTUP.mark('imports')
 
 # Logging setup
 LOG_DIR = 'log'
 USAGE_LOG = os.path.join(LOG_DIR, 'usage.log')
 TECHNICAL_LOG = os.path.join(LOG_DIR, 'techx.json')
+TECHNICAL_COLUMNAR_LOG = os.path.join(LOG_DIR, 'techx.cols')
+BIRTH_STATS = os.path.join(LOG_DIR, 'birthstats.json')
 MAX_USAGE_ENTRIES = 100000
+USAGE_SEGMENT_ENTRIES = 10000
+MAX_BATCH_SIZE = int(os.environ.get('MAX_BATCH_SIZE', 10000))
+# 'server' renders the result of a POST; 'client' computes it in the browser,
+# which then only reports the birthdate to /beacon
+COMPUTE_MODE = os.environ.get('COMPUTE_MODE', 'server')
+# 'stream' sends the head and form of a POST response before logging and
+# computing, then the result; 'buffered' renders the whole page at once
+RENDER_MODE = os.environ.get('RENDER_MODE', 'buffered')
+# Browser cache lifetime of the static page in client compute mode
+CLIENT_PAGE_MAX_AGE = int(os.environ.get('CLIENT_PAGE_MAX_AGE', 300))
+
+# Admission control (0 disables each check): requests per second and burst
+# per client address, the number of proxies that append to X-Forwarded-For,
+# and the requests one process handles at once
+ADMISSION_RATE = float(os.environ.get('ADMISSION_RATE', 0))
+ADMISSION_BURST = float(os.environ.get('ADMISSION_BURST', 20))
+ADMISSION_MAX_CLIENTS = int(os.environ.get('ADMISSION_MAX_CLIENTS', 10000))
+TRUSTED_PROXIES = int(os.environ.get('TRUSTED_PROXIES', 1))
+MAX_IN_FLIGHT = int(os.environ.get('MAX_IN_FLIGHT', 0))
+
+# Memory watchdog: RSS plus log file bytes against MEMORY_BUDGET_MB (the
+# container limit); at each fraction in MEMORY_THRESHOLDS the app degrades one
+# more level: technical sampling scaled by DEGRADED_SAMPLE_SCALE, then usage
+# kept as histogram counts only, then shedding with 503
+MEMORY_BUDGET_MB = float(os.environ.get('MEMORY_BUDGET_MB', 512))
+MEMORY_THRESHOLDS = parse_thresholds(os.environ.get('MEMORY_THRESHOLDS'))
+MEMORY_CHECK_INTERVAL = float(os.environ.get('MEMORY_CHECK_INTERVAL', 5))
+MEMORY_TRACEMALLOC_TOP = int(os.environ.get('MEMORY_TRACEMALLOC_TOP', 0))
+DEGRADED_SAMPLE_SCALE = float(os.environ.get('DEGRADED_SAMPLE_SCALE', 0.1))
+
+# Bearer token for the /admin endpoints, which answer 404 while it is unset
+ADMIN_TOKEN = os.environ.get('ADMIN_TOKEN', '')
+# Profiling: cProfile this fraction of index() calls, and/or run the stack
+# sampler (PROFILE_SAMPLER=1) every PROFILE_INTERVAL seconds; also switchable
+# at runtime through /admin/profile
+PROFILE_FRACTION = float(os.environ.get('PROFILE_FRACTION', 0))
+PROFILE_SAMPLER = os.environ.get('PROFILE_SAMPLER', '') == '1'
+PROFILE_INTERVAL = float(os.environ.get('PROFILE_INTERVAL', 0.01))
+# Response compression (COMPRESS_RESPONSES=0 disables it): bodies from
+# COMPRESS_MIN_BYTES up are sent as brotli or gzip, whichever the client takes
+COMPRESS_RESPONSES = os.environ.get('COMPRESS_RESPONSES', '1') == '1'
+COMPRESS_MIN_BYTES = int(os.environ.get('COMPRESS_MIN_BYTES', 512))
+COMPRESS_GZIP_LEVEL = int(os.environ.get('COMPRESS_GZIP_LEVEL', 6))
+COMPRESS_BROTLI_QUALITY = int(os.environ.get('COMPRESS_BROTLI_QUALITY', 4))
 
 # Ensure log directory exists
 os.makedirs(LOG_DIR, exist_ok=True)
 
+# Log sink backend: 'file' (default), 'stdout' (NDJSON for Cloud Logging) or
+# 'memory' (ring buffer). On Cloud Run files live in memory, so the file
+# backends are capped in bytes.
+LOG_SINK = os.environ.get('LOG_SINK', 'file')
+TECHNICAL_LOG_MAX_BYTES = int(os.environ.get('TECHNICAL_LOG_MAX_BYTES', 64 * 1024 * 1024))
+# The technical budget is for the whole container, so each worker's shard gets
+# an equal share (gunicorn reads its worker count from WEB_CONCURRENCY too)
+WORKER_COUNT = max(1, int(os.environ.get('WEB_CONCURRENCY', 1)))
+TECHNICAL_SHARD_MAX_BYTES = TECHNICAL_LOG_MAX_BYTES // WORKER_COUNT
+MEMORY_LOG_MAX_BYTES = int(os.environ.get('MEMORY_LOG_MAX_BYTES', 8 * 1024 * 1024))
+# Technical log file format: 'ndjson' or 'columnar' (dictionary-encoded blocks, see columnar_log.py)
+TECHNICAL_LOG_FORMAT = os.environ.get('TECHNICAL_LOG_FORMAT', 'ndjson')
+# Seconds a partial columnar block may wait in memory before it is written
+TECHNICAL_BLOCK_MAX_AGE = float(os.environ.get('TECHNICAL_BLOCK_MAX_AGE', 60))
+
+# With file sinks each worker process writes its own shards (usage-<pid>.log,
+# techx-<pid>.json) so several gunicorn workers never share a file;
+# merge_logs.py combines them.
+process_sinks = {}
+
+def create_sinks():
+    if LOG_SINK == 'stdout':
+        stdout = StdoutSink()
+        return {'usage': stdout, 'technical': stdout}
+    if LOG_SINK == 'memory':
+        return {'usage': MemoryRingSink(MEMORY_LOG_MAX_BYTES), 'technical': MemoryRingSink(MEMORY_LOG_MAX_BYTES)}
+    if TECHNICAL_LOG_FORMAT == 'columnar':
+        technical = ColumnarFileSink(shard_path(TECHNICAL_COLUMNAR_LOG), TECHNICAL_SHARD_MAX_BYTES,
+                                     max_block_age=TECHNICAL_BLOCK_MAX_AGE)
+    else:
+        technical = RotatingCompressedFileSink(shard_path(TECHNICAL_LOG), TECHNICAL_SHARD_MAX_BYTES)
+    return {
+        'usage': UsageLog(shard_path(USAGE_LOG), MAX_USAGE_ENTRIES, USAGE_SEGMENT_ENTRIES),
+        'technical': technical,
+    }
+
+def current_sinks():
+    """Log sinks of this process"""
+    pid = os.getpid()
+    if pid not in process_sinks:
+        process_sinks[pid] = create_sinks()
+    return process_sinks[pid]
+
+def log_bytes_used():
+    """Bytes currently held by each log sink of this process"""
+    return {name: sink.bytes_used() for name, sink in current_sinks().items()}
+
+# One shared compact encoder instead of building a new one per json.dumps call
+json_encoder = json.JSONEncoder(separators=(',', ':'), ensure_ascii=False)
+
+def to_json(record):
+    return json_encoder.encode(record)
+
+def write_usage_batch(records):
+    if LOG_SINK == 'stdout':
+        lines = [to_json({'log': 'usage', 'timestamp': ts, 'birthdate': bd}) for ts, bd in records]
+    else:
+        lines = [f"{ts} | {bd}" for ts, bd in records]
+    current_sinks()['usage'].write(lines)
+
+def write_technical_batch(records):
+    sink = current_sinks()['technical']
+    if isinstance(sink, ColumnarFileSink):
+        sink.write_records(records)
+        return
+    if LOG_SINK == 'stdout':
+        records = [dict(log='technical', **r) for r in records]
+    sink.write([to_json(r) for r in records])
+
+def flush_sinks():
+    for sink in current_sinks().values():
+        sink.flush()
+    birth_stats.snapshot()
+
+def write_expired_blocks():
+    for sink in current_sinks().values():
+        if hasattr(sink, 'write_expired'):
+            sink.write_expired()
+
+# Birthdate counts kept up to date in memory and snapshotted for /stats
+birth_stats = BirthStatsStore(BIRTH_STATS, float(os.environ.get('STATS_SNAPSHOT_INTERVAL', 30)))
+
+# Technical log fields and per-method sampling, e.g. TECH_LOG_SAMPLE_RATES="POST=1,GET=0.01"
+technical_capture = TechnicalCapture(
+    fields=[f for f in os.environ.get('TECH_LOG_FIELDS', '').split(',') if f],
+    sample_rates=parse_sample_rates(os.environ.get('TECH_LOG_SAMPLE_RATES')),
+)
+
+# Log records are written by a background thread so requests never wait on disk
+log_writer = LogWriter(
+    max_queue=int(os.environ.get('LOG_QUEUE_SIZE', 10000)),
+    batch_size=int(os.environ.get('LOG_BATCH_SIZE', 500)),
+    flush_interval=float(os.environ.get('LOG_FLUSH_INTERVAL', 1.0)),
+    policy=os.environ.get('LOG_QUEUE_POLICY', 'drop'),
+)
+log_writer.register('usage', write_usage_batch)
+log_writer.register('technical', write_technical_batch)
+log_writer.register('stats', lambda records: birth_stats.snapshot())
+log_writer.add_flush_hook(flush_sinks)
+log_writer.add_tick_hook(write_expired_blocks)
+log_writer.install_shutdown_handlers()
+
+# Prometheus metrics served at /metrics
+registry = metrics.Registry()
+STAGE_SECONDS = registry.histogram('birthdaycalc_stage_seconds', 'Time spent in each stage of a request', ('stage',))
+REQUEST_SECONDS = registry.histogram('birthdaycalc_request_seconds', 'Request latency by endpoint', ('endpoint',))
+REQUESTS = registry.counter('birthdaycalc_requests_total', 'Requests by endpoint, method and status', ('endpoint', 'method', 'status'))
+ERRORS = registry.counter('birthdaycalc_errors_total', 'Errors by kind', ('kind',))
+registry.gauge('birthdaycalc_log_queue_depth', 'Log records waiting for the background writer', log_writer.depth)
+registry.gauge('birthdaycalc_log_records_total', 'Log records by writer outcome',
+               lambda: {(k,): v for k, v in log_writer.counters.items()}, ('outcome',), kind='counter')
+registry.gauge('birthdaycalc_log_bytes', 'Bytes held by each log sink of this process',
+               lambda: {(k,): v for k, v in log_bytes_used().items()}, ('sink',))
+
+def startup_seconds():
+    report = STARTUP.report()
+    values = {(name,): s for name, s in report['phases'].items()}
+    for name in ('before_import', 'import', 'warmup', 'first_response'):
+        if report[f'{name}_seconds'] is not None:
+            values[(name,)] = report[f'{name}_seconds']
+    return values
+
+request_profiler = SampledProfiler(PROFILE_FRACTION)
+stack_sampler = StackSampler(PROFILE_INTERVAL)
+
+COMPRESSED_BYTES = registry.counter('birthdaycalc_compression_bytes_total',
+                                    'Response bytes before and after compression by encoding',
+                                    ('encoding', 'stage'))
+COMPRESSION_CPU = registry.counter('birthdaycalc_compression_cpu_seconds_total',
+                                   'CPU time spent compressing responses by encoding', ('encoding',))
+COMPRESSION_PREFIX_HITS = registry.counter('birthdaycalc_compression_prefix_hits_total',
+                                           'gzip responses that resumed a precompressed page prefix')
+
+SHED = registry.counter('birthdaycalc_shed_total', 'Requests turned away by admission control', ('reason',))
+
+client_buckets = TokenBuckets(ADMISSION_RATE, ADMISSION_BURST, ADMISSION_MAX_CLIENTS) if ADMISSION_RATE > 0 else None
+in_flight = InFlightLimit(MAX_IN_FLIGHT) if MAX_IN_FLIGHT > 0 else None
+if client_buckets is not None:
+    registry.gauge('birthdaycalc_admission_clients', 'Client addresses holding a token bucket', client_buckets.tracked)
+if in_flight is not None:
+    registry.gauge('birthdaycalc_in_flight', 'Requests being handled by this process', in_flight.current)
+
+registry.gauge('birthdaycalc_startup_seconds', 'Cold-start timings of this process by phase',
+               startup_seconds, ('phase',))
+
+# Current memory degradation level, an index into memwatch.LEVELS
+degradation_level = 0
+
+def apply_degradation(level):
+    global degradation_level
+    technical_capture.rate_scale = DEGRADED_SAMPLE_SCALE if level >= 1 else 1.0
+    degradation_level = level
+
+def log_file_bytes():
+    # Memory sinks already count in RSS and stdout holds nothing
+    return directory_bytes(LOG_DIR) if LOG_SINK == 'file' else 0
+
+memory_watchdog = MemoryWatchdog(int(MEMORY_BUDGET_MB * 1024 * 1024), MEMORY_THRESHOLDS, log_file_bytes,
+                                 apply_degradation, MEMORY_CHECK_INTERVAL,
+                                 tracemalloc_top=MEMORY_TRACEMALLOC_TOP)
+registry.gauge('birthdaycalc_memory_bytes', 'Memory counted against the budget by the watchdog',
+               lambda: {(k,): v for k, v in memory_watchdog.usage.items()}, ('kind',))
+registry.gauge('birthdaycalc_degradation_level', 'Memory degradation level (0 normal .. 3 shedding)',
+               lambda: degradation_level)
+registry.gauge('birthdaycalc_degradation_transitions_total', 'Transitions into each degradation level',
+               lambda: {(name,): n for name, n in zip(LEVELS, memory_watchdog.transition_counts)},
+               ('level',), kind='counter')
+
 def log_usage(birthdate_selected, timestamp):
     """Log usage data in simple format"""
     try:
-        log_entry = f"{timestamp} | {birthdate_selected}\n"
-        
-        # Read existing entries
-        entries = []
-        if os.path.exists(USAGE_LOG):
-            with open(USAGE_LOG, 'r', encoding='utf-8') as f:
-                entries = f.readlines()
-        
-        # Add new entry
-        entries.append(log_entry)
-        
-        # Keep only last 100k entries
-        if len(entries) > MAX_USAGE_ENTRIES:
-            entries = entries[-MAX_USAGE_ENTRIES:]
-        
-        # Write back to file
-        with open(USAGE_LOG, 'w', encoding='utf-8') as f:
-            f.writelines(entries)
-            
+        # Under memory pressure only the birthdate histogram is updated
+        if degradation_level < 2:
+            log_writer.submit('usage', (timestamp, birthdate_selected))
+        if birth_stats.add(birthdate_selected):
+            log_writer.submit('stats', None)
     except Exception as e:
+        ERRORS.inc('usage_log')
         print(f"Error logging usage: {e}")
 
 def log_technical_info(request_obj):
-    """Log comprehensive technical information in JSON format"""
+    """Log technical information for sampled requests, as configured by the capture schema"""
     try:
-        timestamp = datetime.now().isoformat()
-        
-        # Gather comprehensive technical data
-        technical_data = {
-            "timestamp": timestamp,
-            "request_info": {
-                "method": request_obj.method,
-                "url": request_obj.url,
-                "base_url": request_obj.base_url,
-                "path": request_obj.path,
-                "query_string": request_obj.query_string.decode('utf-8'),
-                "remote_addr": request_obj.remote_addr,
-                "remote_user": request_obj.remote_user,
-                "scheme": request_obj.scheme,
-                "server": request_obj.server,
-                "environ": {
-                    "SERVER_NAME": request_obj.environ.get('SERVER_NAME'),
-                    "SERVER_PORT": request_obj.environ.get('SERVER_PORT'),
-                    "REQUEST_METHOD": request_obj.environ.get('REQUEST_METHOD'),
-                    "PATH_INFO": request_obj.environ.get('PATH_INFO'),
-                    "QUERY_STRING": request_obj.environ.get('QUERY_STRING'),
-                    "CONTENT_TYPE": request_obj.environ.get('CONTENT_TYPE'),
-                    "CONTENT_LENGTH": request_obj.environ.get('CONTENT_LENGTH'),
-                    "HTTP_HOST": request_obj.environ.get('HTTP_HOST'),
-                    "HTTP_CONNECTION": request_obj.environ.get('HTTP_CONNECTION'),
-                    "HTTP_UPGRADE_INSECURE_REQUESTS": request_obj.environ.get('HTTP_UPGRADE_INSECURE_REQUESTS'),
-                    "HTTP_DNT": request_obj.environ.get('HTTP_DNT'),
-                    "HTTP_SEC_FETCH_DEST": request_obj.environ.get('HTTP_SEC_FETCH_DEST'),
-                    "HTTP_SEC_FETCH_MODE": request_obj.environ.get('HTTP_SEC_FETCH_MODE'),
-                    "HTTP_SEC_FETCH_SITE": request_obj.environ.get('HTTP_SEC_FETCH_SITE'),
-                    "HTTP_SEC_FETCH_USER": request_obj.environ.get('HTTP_SEC_FETCH_USER'),
-                    "HTTP_CACHE_CONTROL": request_obj.environ.get('HTTP_CACHE_CONTROL'),
-                    "HTTP_SEC_CH_UA": request_obj.environ.get('HTTP_SEC_CH_UA'),
-                    "HTTP_SEC_CH_UA_MOBILE": request_obj.environ.get('HTTP_SEC_CH_UA_MOBILE'),
-                    "HTTP_SEC_CH_UA_PLATFORM": request_obj.environ.get('HTTP_SEC_CH_UA_PLATFORM'),
-                    "REMOTE_ADDR": request_obj.environ.get('REMOTE_ADDR'),
-                    "REMOTE_HOST": request_obj.environ.get('REMOTE_HOST'),
-                    "REMOTE_USER": request_obj.environ.get('REMOTE_USER'),
-                    "REQUEST_URI": request_obj.environ.get('REQUEST_URI'),
-                    "SERVER_PROTOCOL": request_obj.environ.get('SERVER_PROTOCOL'),
-                    "SERVER_SOFTWARE": request_obj.environ.get('SERVER_SOFTWARE'),
-                    "GATEWAY_INTERFACE": request_obj.environ.get('GATEWAY_INTERFACE')
-                }
-            },
-            "headers": {
-                "User-Agent": request_obj.headers.get('User-Agent'),
-                "Accept": request_obj.headers.get('Accept'),
-                "Accept-Language": request_obj.headers.get('Accept-Language'),
-                "Accept-Encoding": request_obj.headers.get('Accept-Encoding'),
-                "Referer": request_obj.headers.get('Referer'),
-                "Origin": request_obj.headers.get('Origin'),
-                "Host": request_obj.headers.get('Host'),
-                "Connection": request_obj.headers.get('Connection'),
-                "Upgrade-Insecure-Requests": request_obj.headers.get('Upgrade-Insecure-Requests'),
-                "Sec-Fetch-Dest": request_obj.headers.get('Sec-Fetch-Dest'),
-                "Sec-Fetch-Mode": request_obj.headers.get('Sec-Fetch-Mode'),
-                "Sec-Fetch-Site": request_obj.headers.get('Sec-Fetch-Site'),
-                "Sec-Fetch-User": request_obj.headers.get('Sec-Fetch-User'),
-                "Sec-Ch-Ua": request_obj.headers.get('Sec-Ch-Ua'),
-                "Sec-Ch-Ua-Mobile": request_obj.headers.get('Sec-Ch-Ua-Mobile'),
-                "Sec-Ch-Ua-Platform": request_obj.headers.get('Sec-Ch-Ua-Platform'),
-                "Cache-Control": request_obj.headers.get('Cache-Control'),
-                "Pragma": request_obj.headers.get('Pragma'),
-                "DNT": request_obj.headers.get('DNT'),
-                "X-Forwarded-For": request_obj.headers.get('X-Forwarded-For'),
-                "X-Real-IP": request_obj.headers.get('X-Real-IP'),
-                "X-Forwarded-Proto": request_obj.headers.get('X-Forwarded-Proto')
-            },
-            "form_data": dict(request_obj.form) if request_obj.form else None,
-            "args": dict(request_obj.args) if request_obj.args else None,
-            "files": list(request_obj.files.keys()) if request_obj.files else None,
-            "cookies": dict(request_obj.cookies) if request_obj.cookies else None,
-            "is_json": request_obj.is_json,
-            "is_secure": request_obj.is_secure,
-            "access_route": list(request_obj.access_route) if hasattr(request_obj, 'access_route') else None
-        }
+        technical_data = technical_capture.capture(request_obj)
         
-        # Write to technical log
-        with open(TECHNICAL_LOG, 'a', encoding='utf-8') as f:
-            f.write(json.dumps(technical_data, indent=None, separators=(',', ':')) + '\n')
+        # Serialized and written to the technical log by the background writer
+        if technical_data is not None:
+            log_writer.submit('technical', technical_data)
             
     except Exception as e:
+        ERRORS.inc('technical_log')
         print(f"Error logging technical info: {e}")
 
+# Random background colors for dynamic site appearance
+BG_COLORS = [
+    "linear-gradient(135deg, #667eea 0%, #764ba2 100%)",
+    "linear-gradient(135deg, #f093fb 0%, #f5576c 100%)", 
+    "linear-gradient(135deg, #4facfe 0%, #00f2fe 100%)",
+    "linear-gradient(135deg, #43e97b 0%, #38f9d7 100%)",
+    "linear-gradient(135deg, #fa709a 0%, #fee140 100%)",
+    "linear-gradient(135deg, #a8edea 0%, #fed6e3 100%)",
+    "linear-gradient(135deg, #ff9a9e 0%, #fecfef 100%)",
+    "linear-gradient(135deg, #667eea 0%, #764ba2 100%)",
+    "linear-gradient(135deg, #f6d365 0%, #fda085 100%)",
+    "linear-gradient(135deg, #96fbc4 0%, #f9f586 100%)"
+]
+
+FUNNY_JOKES = [
+    "Wow! You're older than sliced bread! (Literally, it was invented in 1928) 🍞",
+    "Are you sure you didn't personally know Moses? 🏺",
+    "I bet you remember when the Dead Sea was just feeling a little under the weather! 🌊",
+    "You must have some great stories from the Civil War! ⚔️",
+    "Did you help build the pyramids? 🏜️",
+    "I think your birthday candles are a fire hazard! 🔥",
+    "You're so old, your birth certificate is written in hieroglyphics! 📜",
+    "Time to update your driver's license... oh wait, cars weren't invented yet! 🏇",
+    "I bet you knew Methuselah personally! 👴",
+    "Your age has more digits than my phone number! 📱",
+    "Were you around when dinosaurs roamed the Earth? 🦕",
+    "I bet you remember when the Earth was flat! 🌍",
+    "Did you personally witness the invention of the wheel? ⚙️",
+    "You're so old, you make fossils look young! 🦴",
+    "I think you predate carbon dating! ⚛️"
+]
+
 HTML = '''
 <!DOCTYPE html>
 <html lang="en">
@@ -135,533 +322,460 @@ HTML = '''
     <meta charset="UTF-8">
     <meta name="viewport" content="width=device-width, initial-scale=1.0">
     <title>Birthday Age Calculator</title>
-    <style>
-        body { 
-            font-family: 'Segoe UI', Tahoma, Geneva, Verdana, sans-serif; 
-            background: {{ background }}; 
-            margin: 0; 
-            padding: 20px; 
-            min-height: 100vh;
-            display: flex;
-            align-items: center;
-            justify-content: center;
-        }
-        .container { 
-            min-width: 320px;
-            max-width: 600px;
-            width: 90%;
-            background: rgba(255, 255, 255, 0.95); 
-            padding: 2.5em; 
-            border-radius: 20px; 
-            box-shadow: 0 15px 35px rgba(0,0,0,0.1), 0 5px 15px rgba(0,0,0,0.07);
-            backdrop-filter: blur(10px);
-            border: 1px solid rgba(255, 255, 255, 0.2);
-        }
-        h1 { 
-            text-align: center; 
-            color: #2c3e50; 
-            margin-bottom: 1.5em;
-            font-weight: 300;
-            font-size: 2.2em;
-            letter-spacing: -0.5px;
-        }
-        label { 
-            display: block; 
-            margin-bottom: 0.8em; 
-            color: #34495e; 
-            font-weight: 500;
-            font-size: 1.1em;
-        }
-        input[type="date"], select { 
-            width: 100%; 
-            padding: 1em; 
-            margin-bottom: 1.5em; 
-            border: 2px solid #e1e8ed; 
-            border-radius: 12px; 
-            font-size: 1em;
-            transition: all 0.3s ease;
-            background: #fff;
-        }
-        input[type="date"]:focus, select:focus {
-            outline: none;
-            border-color: #667eea;
-            box-shadow: 0 0 0 3px rgba(102, 126, 234, 0.1);
-        }
-        .btn-primary { 
-            width: 100%; 
-            padding: 1em; 
-            background: {{ background }}; 
-            color: #fff; 
-            border: none; 
-            border-radius: 12px; 
-            font-size: 1.1em; 
-            cursor: pointer; 
-            transition: all 0.3s ease;
-            font-weight: 500;
-            letter-spacing: 0.5px;
-            box-shadow: 0 4px 15px rgba(0,0,0,0.2);
-        }
-        .btn-primary:hover { 
-            transform: translateY(-2px);
-            box-shadow: 0 8px 25px rgba(0,0,0,0.3);
-            filter: brightness(1.1);
-        }
-        .btn-toggle {
-            position: absolute;
-            top: 20px;
-            right: 20px;
-            padding: 0.5em 1em;
-            background: rgba(255, 255, 255, 0.95);
-            color: #333;
-            border: 2px solid rgba(255, 255, 255, 0.8);
-            border-radius: 20px;
-            font-size: 0.9em;
-            cursor: pointer;
-            transition: all 0.3s ease;
-            font-weight: 500;
-            backdrop-filter: blur(10px);
-        }
-        .btn-toggle:hover {
-            background: rgba(255, 255, 255, 1);
-            color: #222;
-            transform: scale(1.05);
-            box-shadow: 0 4px 15px rgba(0,0,0,0.15);
-        }
-        .result { 
-            margin-top: 2em; 
-            text-align: center; 
-            font-size: 1.3em; 
-            color: #1a1a1a;
-            padding: 1.5em;
-            background: rgba(255, 255, 255, 0.95);
-            border-radius: 12px;
-            border: 1px solid rgba(102, 126, 234, 0.2);
-            box-shadow: 0 4px 15px rgba(0,0,0,0.1);
-        }
-        .result strong {
-            color: #2c3e50;
-            font-size: 1.2em;
-            font-weight: 600;
-        }
-        #detailedAge {
-            margin-top: 15px !important;
-            font-size: 1em !important;
-            color: #2c3e50 !important;
-            font-family: 'Courier New', monospace;
-            background: rgba(0,0,0,0.05);
-            padding: 10px;
-            border-radius: 8px;
-            font-weight: 500;
-        }
-        .joke {
-            background: linear-gradient(135deg, #ff9a9e 0%, #fecfef 100%);
-            color: #2c3e50;
-            padding: 2em;
-            border-radius: 12px;
-            margin-top: 1em;
-            font-style: italic;
-            font-size: 1.2em;
-            text-align: center;
-            font-weight: 600;
-            box-shadow: 0 8px 25px rgba(0,0,0,0.15);
-            border: 2px solid rgba(255,255,255,0.3);
-        }
-        .date-selects {
-            display: flex;
-            gap: 8px;
-            flex-wrap: wrap;
-        }
-        .date-selects select {
-            margin-bottom: 1.5em;
-            flex: 1;
-            min-width: 80px;
-        }
-        
-        /* Responsive Design */
-        @media (max-width: 768px) {
-            body {
-                padding: 10px;
-            }
-            .container {
-                padding: 1.5em;
-                border-radius: 15px;
-                min-width: 280px;
-                width: 95%;
-            }
-            h1 {
-                font-size: 1.8em;
-                margin-bottom: 1em;
-            }
-            .btn-toggle {
-                top: 15px;
-                right: 15px;
-                padding: 0.4em 0.8em;
-                font-size: 0.8em;
-            }
-            .result {
-                font-size: 1.1em;
-                padding: 1.2em;
-            }
-            .joke {
-                font-size: 1em;
-                padding: 1.5em;
-            }
-            #detailedAge {
-                font-size: 0.9em !important;
-            }
-            .date-selects {
-                flex-direction: column;
-                gap: 4px;
-            }
-            .date-selects select {
-                flex: none;
-                margin-bottom: 0.8em;
-            }
-        }
-        
-        @media (max-width: 480px) {
-            .container {
-                padding: 1.2em;
-                border-radius: 12px;
-                min-width: 260px;
-                width: 98%;
-            }
-            h1 {
-                font-size: 1.5em;
-                margin-bottom: 0.8em;
-                letter-spacing: 0px;
-            }
-            .btn-toggle {
-                position: relative;
-                top: auto;
-                right: auto;
-                margin-bottom: 1em;
-                width: 100%;
-                text-align: center;
-            }
-            label {
-                font-size: 1em;
-                margin-bottom: 0.6em;
-            }
-            input[type="date"], select {
-                padding: 0.8em;
-                margin-bottom: 1.2em;
-                font-size: 16px; /* Prevents zoom on iOS */
-            }
-            .btn-primary {
-                padding: 0.9em;
-                font-size: 1em;
-            }
-            .result {
-                font-size: 1em;
-                padding: 1em;
-                margin-top: 1.5em;
-            }
-            .joke {
-                font-size: 0.95em;
-                padding: 1.2em;
-            }
-            #detailedAge {
-                font-size: 0.8em !important;
-                padding: 8px;
-            }
-        }
-        
-        @media (max-width: 320px) {
-            .container {
-                padding: 1em;
-                min-width: 240px;
-                width: 98%;
-            }
-            h1 {
-                font-size: 1.3em;
-            }
-            .result {
-                font-size: 0.95em;
-            }
-            .joke {
-                font-size: 0.9em;
-                padding: 1em;
-            }
-        }
-        
-        /* Large screens */
-        @media (min-width: 1200px) {
-            .container {
-                max-width: 700px;
-                padding: 3em;
-            }
-            h1 {
-                font-size: 2.5em;
-            }
-            .result {
-                font-size: 1.4em;
-            }
-            .joke {
-                font-size: 1.3em;
-                padding: 2.5em;
-            }
-        }
-    </style>
+    <link rel="stylesheet" href="{{ asset_url('style.css') }}">
 </head>
-<body>
+<body style="--background: {{ background }}">
     <div class="container">
         <button id="modeToggle" class="btn-toggle"></button>
         <h1>Birthday Age Calculator</h1>
-        <form method="post" id="birthForm">
+        <form method="post" id="birthForm"{% if compute_mode == 'client' %} data-compute="client"{% endif %}>
             <label for="birthdate">Enter your birthdate:</label>
             <div id="dateInputContainer"></div>
             <input type="hidden" id="birthdate" name="birthdate" value="{{ birthdate|default('') }}">
             <button type="submit" class="btn-primary">Calculate Age</button>
-        </form>
-        {% if age is not none %}
+        </form>{# result #}        {% if age is not none %}
         <div class="result">
             {% if joke %}
             <div class="joke">{{ joke }}</div>
             {% else %}
             You are <strong>{{ age }}</strong> years old.
-            <div id="detailedAge" style="margin-top: 10px; font-size: 0.9em; color: #555;">
+            {% if days_until_birthday == 0 %}
+            <div class="next-birthday">Happy birthday! 🎂</div>
+            {% elif days_until_birthday is not none %}
+            <div class="next-birthday">Your next birthday is in <strong>{{ days_until_birthday }}</strong> day{{ 's' if days_until_birthday != 1 }}.</div>
+            {% endif %}
+            <div id="detailedAge" data-birthdate="{{ birthdate }}" style="margin-top: 10px; font-size: 0.9em; color: #555;">
                 <span id="timeAlive"></span>
             </div>
             {% endif %}
         </div>
-        <script>
-        // Calculate detailed time alive
-        function updateDetailedAge() {
-            const birthdate = new Date('{{ birthdate }}');
-            const now = new Date();
-            
-            // Calculate differences
-            let years = now.getFullYear() - birthdate.getFullYear();
-            let months = now.getMonth() - birthdate.getMonth();
-            let days = now.getDate() - birthdate.getDate();
-            let hours = now.getHours() - birthdate.getHours();
-            let minutes = now.getMinutes() - birthdate.getMinutes();
-            let seconds = now.getSeconds() - birthdate.getSeconds();
-            
-            // Adjust for negative values
-            if (seconds < 0) {
-                seconds += 60;
-                minutes--;
-            }
-            if (minutes < 0) {
-                minutes += 60;
-                hours--;
-            }
-            if (hours < 0) {
-                hours += 24;
-                days--;
-            }
-            if (days < 0) {
-                const prevMonth = new Date(now.getFullYear(), now.getMonth(), 0);
-                days += prevMonth.getDate();
-                months--;
-            }
-            if (months < 0) {
-                months += 12;
-                years--;
-            }
-            
-            document.getElementById('timeAlive').innerHTML = 
-                `${years} years, ${months} months, ${days} days, ${hours} hours, ${minutes} minutes, ${seconds} seconds`;
-        }
-        
-        // Update every second
-        {% if not joke %}
-        updateDetailedAge();
-        setInterval(updateDetailedAge, 1000);
-        {% endif %}
-        </script>
         {% endif %}
     </div>
     </div>
-    <script>
-    // Detect mobile OS
-    function isMobileOS() {
-        const ua = navigator.userAgent || navigator.vendor || window.opera;
-        if (/android/i.test(ua)) return true;
-        if (/iPad|iPhone|iPod/.test(ua) && !window.MSStream) return true;
-        return false;
-    }
+    {% if compute_mode == 'client' %}
+    <script id="jokes" type="application/json">{{ jokes|tojson }}</script>
+    {% endif %}
+    <script src="{{ asset_url('app.js') }}"></script>
+</body>
+</html>
+'''
 
-    // Current mode state
-    let isDesktopMode = !isMobileOS();
+# Age lookups come from a per-day calendar table, rebuilt after local midnight
+with STARTUP.phase('calendar_table'):
+    current_table()
+schedule_midnight_rebuild()
 
-    // Render date input based on mode
-    function renderDateInput(isDesktop, value) {
-        const container = document.getElementById('dateInputContainer');
-        const toggleBtn = document.getElementById('modeToggle');
-        
-        container.innerHTML = '';
-        
-        if (isDesktop) {
-            // Desktop: keyboard date input
-            container.innerHTML = `<input type="date" id="dateInput" value="${value||''}" required>`;
-            toggleBtn.textContent = 'Switch to Mobile';
-            toggleBtn.style.display = 'block';
-        } else {
-            // Mobile: scroll wheel style
-            const today = new Date();
-            let y = today.getFullYear();
-            let selected = { year: '', month: '', day: '' };
-            if (value) {
-                let parts = value.split('-');
-                if (parts.length === 3) {
-                    selected.year = parts[0];
-                    selected.month = parts[1];
-                    selected.day = parts[2];
-                }
-            }
-            
-            let yearSel = '<select id="yearSel">';
-            for (let i = y; i >= y-125; i--) {
-                yearSel += `<option value="${i}"${selected.year==i?" selected":''}>${i}</option>`;
-            }
-            yearSel += '</select>';
-            
-            let monthSel = '<select id="monthSel">';
-            for (let i = 1; i <= 12; i++) {
-                let m = i.toString().padStart(2,'0');
-                monthSel += `<option value="${m}"${selected.month==m?" selected":''}>${m}</option>`;
-            }
-            monthSel += '</select>';
-            
-            let daySel = '<select id="daySel">';
-            for (let i = 1; i <= 31; i++) {
-                let d = i.toString().padStart(2,'0');
-                daySel += `<option value="${d}"${selected.day==d?" selected":''}>${d}</option>`;
-            }
-            daySel += '</select>';
-            
-            container.innerHTML = `<div class="date-selects">${yearSel}${monthSel}${daySel}</div>`;
-            toggleBtn.textContent = 'Switch to Desktop';
-            toggleBtn.style.display = 'block';
-        }
-    }
+# CSS and JavaScript are served as fingerprinted, precompressed static files
+with STARTUP.phase('static_assets'):
+    STATIC_ASSETS = assets.load()
+STATIC_FILES = {asset.filename: asset for asset in STATIC_ASSETS.values()}
 
-    // Sync selects to hidden input
-    function syncMobileDate() {
-        const y = document.getElementById('yearSel').value;
-        const m = document.getElementById('monthSel').value;
-        const d = document.getElementById('daySel').value;
-        document.getElementById('birthdate').value = `${y}-${m}-${d}`;
-    }
+def asset_url(name):
+    return f"/static/{STATIC_ASSETS[name].filename}"
 
-    // Sync date input to hidden input
-    function syncDesktopDate() {
-        document.getElementById('birthdate').value = document.getElementById('dateInput').value;
-    }
+app.jinja_env.globals['asset_url'] = asset_url
+app.jinja_env.globals['compute_mode'] = COMPUTE_MODE
+app.jinja_env.globals['jokes'] = FUNNY_JOKES
 
-    // Initialize
-    let value = document.getElementById('birthdate').value;
-    
-    function updateInput() {
-        renderDateInput(isDesktopMode, value);
-        if (isDesktopMode) {
-            syncDesktopDate();
-            if (document.getElementById('dateInput')) {
-                document.getElementById('dateInput').addEventListener('input', syncDesktopDate);
-            }
-        } else {
-            syncMobileDate();
-            if (document.getElementById('yearSel')) {
-                document.getElementById('yearSel').addEventListener('change', syncMobileDate);
-                document.getElementById('monthSel').addEventListener('change', syncMobileDate);
-                document.getElementById('daySel').addEventListener('change', syncMobileDate);
-            }
-        }
-    }
-    
-    // Toggle button functionality
-    document.getElementById('modeToggle').addEventListener('click', function() {
-        isDesktopMode = !isDesktopMode;
-        updateInput();
-    });
-    
-    // Initialize
-    updateInput();
-    
-    // On form submit, ensure hidden input is synced
-    document.getElementById('birthForm').addEventListener('submit', function() {
-        if (isDesktopMode) {
-            syncDesktopDate();
-        } else {
-            syncMobileDate();
-        }
-    });
-    </script>
-</body>
-</html>
-'''
+# Compile the page once at startup instead of on every request; the halves
+# before and after the result block are also compiled for streamed responses
+with STARTUP.phase('template'):
+    PAGE_TEMPLATE = app.jinja_env.from_string(HTML)
+    PAGE_HEAD, PAGE_TAIL = (app.jinja_env.from_string(part) for part in HTML.split('{# result #}'))
+
+def page_prefix(background):
+    """The bytes every rendered page with ``background`` starts with: all of it before the birthdate"""
+    return os.path.commonprefix([PAGE_HEAD.render(birthdate=birthdate, background=background)
+                                 for birthdate in ('0', '1')]).encode('utf-8')
+
+# Only the part of a page after its static prefix is compressed per request
+response_compressor = ResponseCompressor(COMPRESS_MIN_BYTES, COMPRESS_GZIP_LEVEL, COMPRESS_BROTLI_QUALITY)
+with STARTUP.phase('compressed_prefixes'):
+    for bg in BG_COLORS:
+        response_compressor.add_prefix(page_prefix(bg))
+
+def render_page(age=None, birthdate='', joke=None, background='', days_until_birthday=None):
+    """Render the full page from the precompiled template"""
+    return PAGE_TEMPLATE.render(age=age, birthdate=birthdate, joke=joke, background=background,
+                                days_until_birthday=days_until_birthday)
+
+class CachedPage:
+    """A fully rendered response body with its gzip variant and validators"""
+
+    def __init__(self, html):
+        self.body = html.encode('utf-8')
+        self.gzip_body = gzip.compress(self.body, compresslevel=9, mtime=0)
+        self.etag = hashlib.sha1(self.body).hexdigest()[:16]
+        self.gzip_etag = self.etag + '-gz'
+
+# A GET without form data can only produce one page per background, so all of
+# them are rendered (and gzipped) once at startup and served from memory.
+with STARTUP.phase('page_cache'):
+    GET_PAGE_CACHE = [CachedPage(render_page(background=bg)) for bg in BG_COLORS]
+GET_PAGE_ETAGS = {page.etag for page in GET_PAGE_CACHE} | {page.gzip_etag for page in GET_PAGE_CACHE}
+PAGES_LAST_MODIFIED = datetime.now(timezone.utc).replace(microsecond=0)
+
+def cached_get_response(request_obj):
+    """Serve a pre-rendered GET page, answering 304 if the client's copy is current"""
+    page = random.choice(GET_PAGE_CACHE)
+    gzipped = request_obj.accept_encodings.best_match(['gzip']) == 'gzip'
+    etag = page.gzip_etag if gzipped else page.etag
+    if_none_match = request_obj.if_none_match
+    if if_none_match:
+        current = next((tag for tag in GET_PAGE_ETAGS if if_none_match.contains(tag)), None)
+        if current is not None:
+            return page_headers(app.response_class(status=304), current)
+    elif request_obj.if_modified_since and request_obj.if_modified_since >= PAGES_LAST_MODIFIED:
+        return page_headers(app.response_class(status=304), etag)
+
+    if gzipped:
+        response = app.response_class(page.gzip_body, mimetype='text/html')
+        response.headers['Content-Encoding'] = 'gzip'
+    else:
+        response = app.response_class(page.body, mimetype='text/html')
+    return page_headers(response, etag)
+
+def page_headers(response, etag):
+    """Validators and caching headers of a cached page, repeated on its 304s"""
+    response.set_etag(etag)
+    response.headers['Vary'] = 'Accept-Encoding'
+    if COMPUTE_MODE == 'client':
+        # Nothing on the page depends on the request, so browsers and CDNs may reuse it
+        response.headers['Cache-Control'] = f'public, max-age={CLIENT_PAGE_MAX_AGE}'
+    else:
+        response.headers['Cache-Control'] = 'no-cache'
+    response.last_modified = PAGES_LAST_MODIFIED
+    return response
+
+# Processes that have run warmup()
+warmed_pids = set()
+
+def warmup():
+    """Do this process's one-time work before it takes traffic.
+
+    Opens the log sinks, starts the log writer thread and runs request
+    parsing, routing, capture, compute, render and JSON encoding once, so
+    none of it lands on the first real request.  Nothing is logged.  Called
+    from gunicorn's post_worker_init hook (after a --preload fork too) and
+    by GET /_ah/warmup; repeated calls return immediately.
+    """
+    if os.getpid() in warmed_pids:
+        return
+    start = time.perf_counter()
+    for sink in current_sinks().values():
+        if hasattr(sink, 'open'):
+            sink.open()
+    log_writer.start()
+    if PROFILE_SAMPLER:
+        stack_sampler.start()
+    memory_watchdog.start()
+    with app.test_request_context('/', method='POST', data={'birthdate': '2000-01-01'}):
+        technical_capture.capture(request)
+        result = age_result(request.form['birthdate'])
+        render_page(age=result['age'], birthdate=result['birthdate'], background=BG_COLORS[0],
+                    days_until_birthday=result['days_until_birthday'])
+        jsonify(result)
+    warmed_pids.add(os.getpid())
+    STARTUP.warmup_seconds = time.perf_counter() - start
+
+@app.before_request
+def start_timer():
+    g.request_start = time.perf_counter()
+
+# Monitoring, probes and immutable assets are always admitted
+ADMISSION_EXEMPT = {'static_file', 'metrics_endpoint', 'warmup_endpoint', 'startup_report', 'admin_profile',
+                    'admin_memory', 'usage_history'}
+
+@app.before_request
+def admit():
+    """Turn a request away with 429/503 before it logs or renders anything"""
+    if request.endpoint in ADMISSION_EXEMPT:
+        return None
+    if degradation_level >= 3:
+        SHED.inc('memory')
+        response = app.response_class('Service Unavailable\n', status=503, mimetype='text/plain')
+        response.headers['Retry-After'] = str(int(MEMORY_CHECK_INTERVAL) + 1)
+        return response
+    if client_buckets is not None:
+        wait = client_buckets.take(client_key(request, TRUSTED_PROXIES))
+        if wait:
+            SHED.inc('rate_limited')
+            response = app.response_class('Too Many Requests\n', status=429, mimetype='text/plain')
+            response.headers['Retry-After'] = str(int(wait) + 1)
+            return response
+    if in_flight is not None:
+        if not in_flight.try_acquire():
+            SHED.inc('overloaded')
+            response = app.response_class('Service Unavailable\n', status=503, mimetype='text/plain')
+            response.headers['Retry-After'] = '1'
+            return response
+        g.in_flight = True
+    return None
+
+@app.teardown_request
+def release_in_flight(exc):
+    if g.pop('in_flight', False):
+        in_flight.release()
+
+# Label values must come from a fixed set, or a client could create new series at will
+METRIC_METHODS = {'GET', 'HEAD', 'POST'}
+
+def metric_endpoint(request_obj):
+    """Endpoint label: the matched endpoint, the route a 405 was for, else not_found"""
+    if request_obj.endpoint:
+        return request_obj.endpoint
+    error = request_obj.routing_exception
+    if isinstance(error, MethodNotAllowed) and error.valid_methods:
+        try:
+            return app.create_url_adapter(request_obj).match(method=error.valid_methods[0])[0]
+        except HTTPException:
+            pass
+    return 'not_found'
+
+@app.after_request
+def record_request(response):
+    endpoint = metric_endpoint(request)
+    if 'request_start' in g:
+        REQUEST_SECONDS.observe(time.perf_counter() - g.request_start, endpoint)
+    method = request.method if request.method in METRIC_METHODS else 'other'
+    REQUESTS.inc(endpoint, method, response.status_code)
+    STARTUP.first_response()
+    return response
+
+# Registered after record_request so it runs first and its time is included
+@app.after_request
+def compress_response(response):
+    """Encode buffered bodies the client can decode; streamed ones pass through"""
+    if not COMPRESS_RESPONSES:
+        return response
+    result = response_compressor.compress_response(response, request.accept_encodings)
+    if result is not None:
+        COMPRESSED_BYTES.inc(result['encoding'], 'in', amount=result['bytes_in'])
+        COMPRESSED_BYTES.inc(result['encoding'], 'out', amount=result['bytes_out'])
+        COMPRESSION_CPU.inc(result['encoding'], amount=result['cpu_seconds'])
+        if result['prefix_hit']:
+            COMPRESSION_PREFIX_HITS.inc()
+    return response
+
+@app.route('/static/<filename>')
+def static_file(filename):
+    """Serve a fingerprinted asset; its name changes with its content, so cache forever"""
+    asset = STATIC_FILES.get(filename)
+    if asset is None:
+        return app.response_class('Not Found', status=404, mimetype='text/plain')
+    encoding = asset.negotiate(request.accept_encodings)
+    response = app.response_class(asset.bodies[encoding], mimetype=asset.mimetype)
+    if encoding != 'identity':
+        response.headers['Content-Encoding'] = encoding
+    response.headers['Vary'] = 'Accept-Encoding'
+    response.headers['Cache-Control'] = 'public, max-age=31536000, immutable'
+    response.set_etag(f"{asset.digest}-{encoding}")
+    return response
+
+def submit_birthdate(birthdate):
+    """Log a submitted birthdate and work out what the page shows: (age, joke, days until birthday)"""
+    timestamp = datetime.now().isoformat()
+
+    # Log usage data
+    with STAGE_SECONDS.time('usage_log'):
+        log_usage(birthdate, timestamp)
+
+    with STAGE_SECONDS.time('compute'):
+        result = age_result(birthdate)
+    if result['error']:
+        ERRORS.inc('invalid_birthdate')
+        print(f"Error calculating age: {result['error']}")
+        return None, None, None
+    if result['over_max_age']:
+        # Age over 125 years: show a joke instead of the age
+        return None, random.choice(FUNNY_JOKES), None
+    return result['age'], None, result['days_until_birthday']
+
+def streamed_index():
+    """POST / as a stream: head and form first, then logging and compute, then the result"""
+    birthdate = request.form.get('birthdate', '')
+    background = random.choice(BG_COLORS)
+
+    def generate():
+        yield PAGE_HEAD.render(birthdate=birthdate, background=background)
+        with STAGE_SECONDS.time('technical_log'):
+            log_technical_info(request)
+        age, joke, days_until_birthday = submit_birthdate(birthdate)
+        with STAGE_SECONDS.time('render'):
+            yield PAGE_TAIL.render(age=age, birthdate=birthdate, joke=joke, background=background,
+                                   days_until_birthday=days_until_birthday)
+
+    return app.response_class(stream_with_context(generate()), mimetype='text/html')
 
 @app.route('/', methods=['GET', 'POST'])
+@request_profiler.wrap
 def index():
+    if RENDER_MODE == 'stream' and request.method == 'POST':
+        return streamed_index()
+
     # Log technical information for every request
+    with STAGE_SECONDS.time('technical_log'):
+        log_technical_info(request)
+
+    if request.method in ('GET', 'HEAD'):
+        return cached_get_response(request)
+
+    birthdate = request.form.get('birthdate', '')
+    background = random.choice(BG_COLORS)
+    age, joke, days_until_birthday = submit_birthdate(birthdate)
+
+    with STAGE_SECONDS.time('render'):
+        return render_page(age=age, birthdate=birthdate, joke=joke, background=background,
+                           days_until_birthday=days_until_birthday)
+
+@app.route('/beacon', methods=['POST'])
+def beacon():
+    """Usage report from a page that computed the age itself: enqueue and return"""
+    log_usage(request.form.get('birthdate', ''), datetime.now().isoformat())
+    return '', 204
+
+@app.route('/api/age', methods=['GET', 'POST'])
+def api_age():
+    """Age for one birthdate as JSON, from ?birthdate= or a JSON/form body"""
+    log_technical_info(request)
+
+    payload = request.get_json(silent=True) if request.is_json else None
+    if isinstance(payload, dict):
+        birthdate = payload.get('birthdate', '')
+    else:
+        birthdate = request.values.get('birthdate', '')
+    log_usage(birthdate, datetime.now().isoformat())
+
+    result = age_result(birthdate)
+    if result['error']:
+        return jsonify(result), 400
+    if result['over_max_age']:
+        result['joke'] = random.choice(FUNNY_JOKES)
+    return jsonify(result)
+
+@app.route('/api/age/batch', methods=['POST'])
+def api_age_batch():
+    """Ages for a JSON list of birthdates, one result per item in input order"""
     log_technical_info(request)
-    
-    age = None
-    birthdate = ''
-    joke = None
-    
-    # Generate random background colors for dynamic site appearance
-    import random
-    bg_colors = [
-        "linear-gradient(135deg, #667eea 0%, #764ba2 100%)",
-        "linear-gradient(135deg, #f093fb 0%, #f5576c 100%)", 
-        "linear-gradient(135deg, #4facfe 0%, #00f2fe 100%)",
-        "linear-gradient(135deg, #43e97b 0%, #38f9d7 100%)",
-        "linear-gradient(135deg, #fa709a 0%, #fee140 100%)",
-        "linear-gradient(135deg, #a8edea 0%, #fed6e3 100%)",
-        "linear-gradient(135deg, #ff9a9e 0%, #fecfef 100%)",
-        "linear-gradient(135deg, #667eea 0%, #764ba2 100%)",
-        "linear-gradient(135deg, #f6d365 0%, #fda085 100%)",
-        "linear-gradient(135deg, #96fbc4 0%, #f9f586 100%)"
-    ]
-    background = random.choice(bg_colors)
-    
-    funny_jokes = [
-        "Wow! You're older than sliced bread! (Literally, it was invented in 1928) 🍞",
-        "Are you sure you didn't personally know Moses? 🏺",
-        "I bet you remember when the Dead Sea was just feeling a little under the weather! 🌊",
-        "You must have some great stories from the Civil War! ⚔️",
-        "Did you help build the pyramids? 🏜️",
-        "I think your birthday candles are a fire hazard! 🔥",
-        "You're so old, your birth certificate is written in hieroglyphics! 📜",
-        "Time to update your driver's license... oh wait, cars weren't invented yet! 🏇",
-        "I bet you knew Methuselah personally! 👴",
-        "Your age has more digits than my phone number! 📱",
-        "Were you around when dinosaurs roamed the Earth? 🦕",
-        "I bet you remember when the Earth was flat! 🌍",
-        "Did you personally witness the invention of the wheel? ⚙️",
-        "You're so old, you make fossils look young! 🦴",
-        "I think you predate carbon dating! ⚛️"
-    ]
-    
+
+    payload = request.get_json(silent=True)
+    birthdates = payload.get('birthdates') if isinstance(payload, dict) else payload
+    if not isinstance(birthdates, list):
+        return jsonify({'error': 'expected a JSON list of birthdates or {"birthdates": [...]}'}), 400
+    if len(birthdates) > MAX_BATCH_SIZE:
+        return jsonify({'error': f'at most {MAX_BATCH_SIZE} birthdates per batch'}), 413
+
+    results = batch_age_results(birthdates)
+    errors = sum(1 for r in results if r['error'])
+    return jsonify({'count': len(results), 'errors': errors, 'results': results})
+
+@app.route('/api/usage')
+def usage_history():
+    """Usage entries with start <= timestamp < end as streamed NDJSON (admin only).
+
+    ``start``/``end`` are ISO timestamps or prefixes (``2025-08-01T14``);
+    ``limit`` caps the entries returned (default 1000).  Records still in
+    the log writer's queue are not included yet.
+    """
+    if not is_admin(request):
+        return app.response_class('Not Found', status=404, mimetype='text/plain')
+    if LOG_SINK != 'file':
+        return jsonify({'error': 'usage history is only kept with LOG_SINK=file'}), 409
+    start = request.args.get('start') or None
+    end = request.args.get('end') or None
+    limit = min(max(request.args.get('limit', 1000, type=int), 0), MAX_USAGE_ENTRIES)
+
+    def generate():
+        for line in islice(query_usage(USAGE_LOG, start, end), limit):
+            timestamp, _, birthdate = line.partition(' | ')
+            yield to_json({'timestamp': timestamp, 'birthdate': birthdate}) + '\n'
+
+    return app.response_class(generate(), mimetype='application/x-ndjson')
+
+@app.route('/stats')
+def stats():
+    """Birthdate counts by year, month and weekday from the in-memory histogram"""
+    top = min(max(request.args.get('top', 10, type=int), 0), 1000)
+    return jsonify(birth_stats.summary(top))
+
+@app.route('/metrics')
+def metrics_endpoint():
+    """Prometheus text exposition of this process's metrics"""
+    return app.response_class(registry.render(), mimetype='text/plain; version=0.0.4')
+
+@app.route('/_ah/warmup')
+def warmup_endpoint():
+    """Warm this process up; used as the Cloud Run startup probe"""
+    warmup()
+    return '', 204
+
+@app.route('/startup')
+def startup_report():
+    """Import, warmup and time-to-first-response timings of this process"""
+    return jsonify(STARTUP.report())
+
+def is_admin(request_obj):
+    """Whether the request carries ADMIN_TOKEN as its bearer token"""
+    if not ADMIN_TOKEN:
+        return False
+    return hmac.compare_digest(request_obj.headers.get('Authorization', ''), f'Bearer {ADMIN_TOKEN}')
+
+def profile_status():
+    return {
+        'pid': os.getpid(),
+        'cprofile': {'fraction': request_profiler.fraction, 'profiled_calls': request_profiler.calls},
+        'sampler': {'running': stack_sampler.running(), 'interval': stack_sampler.interval,
+                    'samples': stack_sampler.samples, 'stacks': len(stack_sampler.stacks)},
+    }
+
+@app.route('/admin/profile', methods=['GET', 'POST'])
+def admin_profile():
+    """Switch this process's profilers on or off (POST) and read their results (GET).
+
+    POST fields: ``fraction`` (share of index() calls to cProfile), ``sampler``
+    (``start``/``stop``), ``seconds`` (stop the sampler after this long),
+    ``interval`` and ``reset=1``.  GET ``format``: ``status`` (default),
+    ``pstats`` (binary, for ``python -m pstats``/snakeviz), ``text`` or
+    ``collapsed`` (for flamegraph.pl/speedscope).
+    """
+    if not is_admin(request):
+        return app.response_class('Not Found', status=404, mimetype='text/plain')
     if request.method == 'POST':
-        birthdate = request.form.get('birthdate', '')
-        timestamp = datetime.now().isoformat()
-        
-        # Log usage data
-        log_usage(birthdate, timestamp)
-        
-        try:
-            bdate = datetime.strptime(birthdate, '%Y-%m-%d')
-            today = datetime.today()
-            calculated_age = today.year - bdate.year - ((today.month, today.day) < (bdate.month, bdate.day))
-            
-            # Check if age is over 125 years (show joke instead of age)
-            if calculated_age > 125:
-                joke = random.choice(funny_jokes)
-                age = None  # Don't show the age, just the joke
-            else:
-                age = calculated_age
-                
-        except Exception as e:
-            print(f"Error calculating age: {e}")
-            age = None
-            
-    return render_template_string(HTML, age=age, birthdate=birthdate, joke=joke, background=background)
+        if request.values.get('reset') == '1':
+            request_profiler.reset()
+            stack_sampler.reset()
+        if 'fraction' in request.values:
+            request_profiler.fraction = min(max(request.values.get('fraction', 0.0, type=float), 0.0), 1.0)
+        if 'interval' in request.values:
+            stack_sampler.interval = max(request.values.get('interval', 0.01, type=float), 0.001)
+        if request.values.get('sampler') == 'start':
+            stack_sampler.start(request.values.get('seconds', type=float))
+        elif request.values.get('sampler') == 'stop':
+            stack_sampler.stop()
+        return jsonify(profile_status())
+
+    output = request.args.get('format', 'status')
+    if output == 'pstats':
+        response = app.response_class(request_profiler.pstats_bytes(), mimetype='application/octet-stream')
+        response.headers['Content-Disposition'] = f'attachment; filename=index-{os.getpid()}.pstats'
+        return response
+    if output == 'text':
+        return app.response_class(request_profiler.report(request.args.get('sort', 'cumulative')),
+                                  mimetype='text/plain')
+    if output == 'collapsed':
+        return app.response_class(stack_sampler.collapsed(), mimetype='text/plain')
+    return jsonify(profile_status())
+
+@app.route('/admin/memory')
+def admin_memory():
+    """Watchdog status: level, usage, recent transitions and top allocators if traced"""
+    if not is_admin(request):
+        return app.response_class('Not Found', status=404, mimetype='text/plain')
+    return jsonify(memory_watchdog.status())
+
+STARTUP.imported()
 
 if __name__ == '__main__':
+    warmup()
     port = int(os.environ.get('PORT', 5000))
     app.run(host='0.0.0.0', port=port, debug=False)
@@ -0,0 +1,304 @@
+"""Asyncio serving mode: the same routes on an event loop instead of threads.
+
+``application`` is an ASGI app wrapping the Flask app.  Request handling
+never waits on disk (log records go to the background LogWriter queue), so
+the hot routes are dispatched inline on the event loop and one process keeps
+any number of slow connections open without tying up a worker thread each.
+Routes that read files or do bulk work run in the default thread pool.
+
+    uvicorn asgi:application --port 5000                  # where uvicorn is installed
+    python asgi.py --port 5000                            # built-in asyncio HTTP/1.1 server
+
+The built-in server handles keep-alive, Content-Length request bodies and
+chunked responses, which is what the page, the API and the benchmarks need.
+A connection that takes longer than ``READ_TIMEOUT`` seconds to send its
+headers, or then its body, is closed.
+"""
+import argparse
+import asyncio
+import io
+import os
+import sys
+from http import HTTPStatus
+from urllib.parse import unquote
+
+import app as app_module
+
+flask_app = app_module.app
+
+# Routes that may block: they read files, take a lock for long or do bulk work
+OFFLOADED_PATHS = ('/stats', '/api/age/batch', '/api/usage', '/_ah/warmup', '/admin/')
+MAX_BODY_BYTES = int(os.environ.get('MAX_BODY_BYTES', 16 * 1024 * 1024))
+MAX_HEADER_BYTES = 64 * 1024
+# Seconds a connection may take to send a request's headers (idle keep-alive
+# time included) and then its body, so a slow client cannot hold it forever
+READ_TIMEOUT = float(os.environ.get('READ_TIMEOUT', 30))
+
+# A full queue must drop rather than block the event loop
+if app_module.log_writer.policy == 'block':
+    print("asgi: LOG_QUEUE_POLICY=block would stall the event loop; using 'drop'")
+    app_module.log_writer.policy = 'drop'
+
+
+def wsgi_environ(scope, body):
+    """WSGI environ for an ASGI HTTP scope and its complete request body"""
+    raw_path = scope.get('raw_path') or scope['path'].encode('utf-8')
+    server = scope.get('server') or ('localhost', 80)
+    client = scope.get('client') or ('', 0)
+    environ = {
+        'REQUEST_METHOD': scope['method'],
+        'SCRIPT_NAME': scope.get('root_path', ''),
+        'PATH_INFO': unquote(raw_path.decode('latin-1').split('?', 1)[0], 'latin-1'),
+        'QUERY_STRING': scope.get('query_string', b'').decode('latin-1'),
+        'SERVER_NAME': server[0],
+        'SERVER_PORT': str(server[1]),
+        'SERVER_PROTOCOL': f"HTTP/{scope.get('http_version', '1.1')}",
+        'REMOTE_ADDR': client[0],
+        'REMOTE_PORT': str(client[1]),
+        'wsgi.version': (1, 0),
+        'wsgi.url_scheme': scope.get('scheme', 'http'),
+        'wsgi.input': io.BytesIO(body),
+        'wsgi.errors': sys.stderr,
+        'wsgi.multithread': True,
+        'wsgi.multiprocess': False,
+        'wsgi.run_once': False,
+    }
+    for name, value in scope['headers']:
+        name = name.decode('latin-1').upper().replace('-', '_')
+        value = value.decode('latin-1')
+        if name == 'CONTENT_TYPE' or name == 'CONTENT_LENGTH':
+            environ[name] = value
+            continue
+        key = 'HTTP_' + name
+        environ[key] = f"{environ[key]},{value}" if key in environ else value
+    return environ
+
+
+def call_wsgi(environ):
+    """Run the Flask app; returns (status code, header list, body iterable)"""
+    started = []
+
+    def start_response(status, headers, exc_info=None):
+        started[:] = [int(status.split(' ', 1)[0]), headers]
+
+    body = flask_app.wsgi_app(environ, start_response)
+    return started[0], started[1], body
+
+
+def call_wsgi_buffered(environ):
+    status, headers, body = call_wsgi(environ)
+    try:
+        return status, headers, [b''.join(body)]
+    finally:
+        if hasattr(body, 'close'):
+            body.close()
+
+
+async def read_body(receive):
+    chunks = []
+    while True:
+        message = await receive()
+        if message['type'] == 'http.disconnect':
+            return None
+        chunks.append(message.get('body', b''))
+        if not message.get('more_body'):
+            return b''.join(chunks)
+
+
+async def lifespan(receive, send):
+    loop = asyncio.get_running_loop()
+    while True:
+        message = await receive()
+        if message['type'] == 'lifespan.startup':
+            app_module.warmup()
+            await send({'type': 'lifespan.startup.complete'})
+        elif message['type'] == 'lifespan.shutdown':
+            await loop.run_in_executor(None, app_module.log_writer.flush)
+            await send({'type': 'lifespan.shutdown.complete'})
+            return
+
+
+async def application(scope, receive, send):
+    """ASGI entry point"""
+    if scope['type'] == 'lifespan':
+        return await lifespan(receive, send)
+    if scope['type'] != 'http':
+        return
+    body = await read_body(receive)
+    if body is None:
+        return
+    environ = wsgi_environ(scope, body)
+    if scope['path'].startswith(OFFLOADED_PATHS):
+        status, headers, chunks = await asyncio.get_running_loop().run_in_executor(
+            None, call_wsgi_buffered, environ)
+    else:
+        status, headers, chunks = call_wsgi(environ)
+    await send({'type': 'http.response.start', 'status': status,
+                'headers': [(k.lower().encode('latin-1'), v.encode('latin-1')) for k, v in headers]})
+    try:
+        # Each chunk of a streamed page is sent before the next one is produced
+        for chunk in chunks:
+            if chunk:
+                await send({'type': 'http.response.body', 'body': chunk, 'more_body': True})
+    finally:
+        if hasattr(chunks, 'close'):
+            chunks.close()
+    await send({'type': 'http.response.body', 'body': b''})
+
+
+async def error_response(writer, status):
+    phrase = HTTPStatus(status).phrase
+    writer.write(f"HTTP/1.1 {status} {phrase}\r\nContent-Length: 0\r\nConnection: close\r\n\r\n".encode())
+    await writer.drain()
+
+
+async def handle_connection(application, reader, writer):
+    """Serve HTTP/1.1 requests on one connection until it closes"""
+    sockname = writer.get_extra_info('sockname') or ('localhost', 0)
+    peername = writer.get_extra_info('peername') or ('', 0)
+    try:
+        while True:
+            try:
+                head = await asyncio.wait_for(reader.readuntil(b'\r\n\r\n'), READ_TIMEOUT)
+            except asyncio.LimitOverrunError:
+                await error_response(writer, 431)
+                return
+            except (asyncio.IncompleteReadError, asyncio.TimeoutError, ConnectionError):
+                return
+            lines = head[:-4].split(b'\r\n')
+            try:
+                method, target, version = lines[0].decode('latin-1').split(' ', 2)
+            except ValueError:
+                await error_response(writer, 400)
+                return
+            headers = []
+            for line in lines[1:]:
+                name, sep, value = line.partition(b':')
+                if sep:
+                    headers.append((name.strip().lower(), value.strip()))
+            fields = dict(headers)
+            if b'chunked' in fields.get(b'transfer-encoding', b''):
+                await error_response(writer, 411)
+                return
+            try:
+                length = int(fields.get(b'content-length', 0))
+            except ValueError:
+                await error_response(writer, 400)
+                return
+            if length < 0:
+                await error_response(writer, 400)
+                return
+            if length > MAX_BODY_BYTES:
+                await error_response(writer, 413)
+                return
+            try:
+                body = await asyncio.wait_for(reader.readexactly(length), READ_TIMEOUT) if length else b''
+            except asyncio.TimeoutError:
+                await error_response(writer, 408)
+                return
+            connection = fields.get(b'connection', b'').lower()
+            keep_alive = connection != b'close' if version == 'HTTP/1.1' else connection == b'keep-alive'
+
+            raw_path, _, query = target.encode('latin-1').partition(b'?')
+            scope = {
+                'type': 'http', 'asgi': {'version': '3.0'}, 'http_version': version[5:],
+                'method': method, 'scheme': 'http', 'path': unquote(raw_path.decode('latin-1')),
+                'raw_path': raw_path, 'query_string': query, 'root_path': '', 'headers': headers,
+                'server': sockname[:2], 'client': peername[:2],
+            }
+            await run_request(application, scope, body, method == 'HEAD', keep_alive, writer)
+            if not keep_alive:
+                return
+    except ConnectionError:
+        pass
+    finally:
+        writer.close()
+
+
+async def run_request(application, scope, body, head_only, keep_alive, writer):
+    received = False
+    state = {'start': None, 'chunked': False}
+
+    async def receive():
+        nonlocal received
+        if received:
+            return {'type': 'http.disconnect'}
+        received = True
+        return {'type': 'http.request', 'body': body, 'more_body': False}
+
+    def write_head(extra):
+        status, headers = state['start']
+        lines = [f"HTTP/1.1 {status} {HTTPStatus(status).phrase}".encode()]
+        lines += [name + b': ' + value for name, value in headers]
+        lines += extra
+        if not keep_alive:
+            lines.append(b'Connection: close')
+        writer.write(b'\r\n'.join(lines) + b'\r\n\r\n')
+
+    async def send(message):
+        if message['type'] == 'http.response.start':
+            state['start'] = (message['status'], message.get('headers', []))
+            state['head_sent'] = False
+            return
+        chunk = message.get('body', b'')
+        more = message.get('more_body', False)
+        if not state['head_sent']:
+            state['head_sent'] = True
+            has_length = any(name == b'content-length' for name, _ in state['start'][1])
+            if head_only or has_length:
+                write_head([])
+            elif more:
+                state['chunked'] = True
+                write_head([b'Transfer-Encoding: chunked'])
+            else:
+                write_head([b'Content-Length: ' + str(len(chunk)).encode()])
+        if head_only:
+            return
+        if state['chunked']:
+            if chunk:
+                writer.write(b'%x\r\n%b\r\n' % (len(chunk), chunk))
+            if not more:
+                writer.write(b'0\r\n\r\n')
+        elif chunk:
+            writer.write(chunk)
+        await writer.drain()
+
+    await application(scope, receive, send)
+
+
+async def serve(application, host, port):
+    startup = asyncio.Queue()
+    await startup.put({'type': 'lifespan.startup'})
+    done = asyncio.Event()
+
+    async def startup_send(message):
+        done.set()
+
+    lifespan_task = asyncio.create_task(application({'type': 'lifespan'}, startup.get, startup_send))
+    await done.wait()
+    server = await asyncio.start_server(lambda r, w: handle_connection(application, r, w), host, port,
+                                        limit=MAX_HEADER_BYTES, backlog=1024)
+    print(f"Serving on http://{host}:{port}", flush=True)
+    try:
+        async with server:
+            await server.serve_forever()
+    finally:
+        done.clear()
+        await startup.put({'type': 'lifespan.shutdown'})
+        await done.wait()
+        await lifespan_task
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split('\n', 1)[0])
+    parser.add_argument('--host', default='0.0.0.0')
+    parser.add_argument('--port', type=int, default=int(os.environ.get('PORT', 5000)))
+    args = parser.parse_args(argv)
+    try:
+        asyncio.run(serve(application, args.host, args.port))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == '__main__':
+    main()
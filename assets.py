@@ -0,0 +1,93 @@
+"""Fingerprinted static assets with precompressed variants.
+
+``python assets.py`` writes ``static/dist/<name>.<hash>.<ext>`` plus ``.gz`` and
+``.br`` files and a ``manifest.json`` (the Docker build runs this).  At startup
+the app loads the built files, or compresses the sources in memory if the build
+step has not been run or is out of date.
+"""
+import gzip
+import hashlib
+import json
+import os
+import sys
+
+try:
+    import brotli
+except ImportError:  # brotli is optional; gzip is always available
+    brotli = None
+
+STATIC_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'static')
+DIST_DIR = os.path.join(STATIC_DIR, 'dist')
+SOURCES = ['style.css', 'app.js']
+MIMETYPES = {'.css': 'text/css', '.js': 'text/javascript'}
+
+
+def fingerprint(name, body):
+    """``(digest, fingerprinted filename)`` of a source: ``app.js`` -> ``app.<hash>.js``"""
+    root, ext = os.path.splitext(name)
+    digest = hashlib.sha256(body).hexdigest()[:12]
+    return digest, f"{root}.{digest}{ext}"
+
+
+class Asset:
+    """One fingerprinted asset and its encoded bodies; missing encodings are compressed here"""
+
+    def __init__(self, name, body, gzip_body=None, br_body=None):
+        ext = os.path.splitext(name)[1]
+        self.digest, self.filename = fingerprint(name, body)
+        self.mimetype = MIMETYPES.get(ext, 'application/octet-stream')
+        self.bodies = {'identity': body}
+        self.bodies['gzip'] = gzip_body if gzip_body is not None else gzip.compress(body, 9, mtime=0)
+        if br_body is None and brotli is not None:
+            br_body = brotli.compress(body, quality=11)
+        if br_body is not None:
+            self.bodies['br'] = br_body
+
+    def negotiate(self, accept_encodings):
+        """Best encoding the client accepts by q-value, preferring brotli over gzip on a tie"""
+        offered = [encoding for encoding in ('br', 'gzip') if encoding in self.bodies]
+        return accept_encodings.best_match(offered) or 'identity'
+
+
+def read_file(path):
+    if not os.path.exists(path):
+        return None
+    with open(path, 'rb') as f:
+        return f.read()
+
+
+def load():
+    """Map each source name to its Asset, reusing build output that matches the sources.
+
+    Only encodings without a built file for the source's current hash are
+    compressed, so a built image does no compression at startup.
+    """
+    assets = {}
+    for name in SOURCES:
+        body = read_file(os.path.join(STATIC_DIR, name))
+        built = os.path.join(DIST_DIR, fingerprint(name, body)[1])
+        assets[name] = Asset(name, body, read_file(built + '.gz'), read_file(built + '.br'))
+    return assets
+
+
+def build(out_dir=DIST_DIR):
+    """Write fingerprinted, precompressed copies of every source to ``out_dir``"""
+    os.makedirs(out_dir, exist_ok=True)
+    manifest = {}
+    for name, asset in load().items():
+        path = os.path.join(out_dir, asset.filename)
+        suffixes = {'identity': '', 'gzip': '.gz', 'br': '.br'}
+        for encoding, body in asset.bodies.items():
+            with open(path + suffixes[encoding], 'wb') as f:
+                f.write(body)
+        manifest[name] = asset.filename
+    with open(os.path.join(out_dir, 'manifest.json'), 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, indent=2)
+    return manifest
+
+
+if __name__ == '__main__':
+    for name, filename in build().items():
+        print(f"{name} -> {filename}")
+    if brotli is None:
+        print("brotli not installed; only gzip variants were written", file=sys.stderr)
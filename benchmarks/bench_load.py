@@ -0,0 +1,221 @@
+"""Load generator: a GET/POST mix against the WSGI app in-process or a local server.
+
+    python benchmarks/bench_load.py --target wsgi --requests 5000 --post-ratio 0.5
+    python benchmarks/bench_load.py --target gunicorn --workers 2 --concurrency 16 --output results/load.json
+    python benchmarks/bench_load.py --target asgi --concurrency 80
+
+Reports throughput, latency percentiles, status counts and the bytes the
+run left in the app's log/ directory.
+"""
+import argparse
+import os
+import random
+import shutil
+import signal
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import urllib.error
+import urllib.parse
+import urllib.request
+from datetime import date, timedelta
+
+from common import REPO_DIR, directory_bytes, import_app, latency_summary, run_metadata, save_results
+
+BROWSER_HEADERS = {
+    'User-Agent': 'Mozilla/5.0 (X11; Linux x86_64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/126.0 Safari/537.36',
+    'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,*/*;q=0.8',
+    'Accept-Language': 'en-US,en;q=0.9',
+}
+
+
+def random_birthdates(count, seed=0):
+    rng = random.Random(seed)
+    today = date.today()
+    return [(today - timedelta(days=rng.randrange(46000))).isoformat() for _ in range(count)]
+
+
+class WSGIClient:
+    """Requests through the Flask test client, no sockets involved"""
+
+    def __init__(self, app_module):
+        self.client = app_module.app.test_client()
+
+    def get(self):
+        response = self.client.get('/', headers=BROWSER_HEADERS)
+        return response.status_code, len(response.data)
+
+    def post(self, birthdate):
+        response = self.client.post('/', data={'birthdate': birthdate}, headers=BROWSER_HEADERS)
+        return response.status_code, len(response.data)
+
+
+class HTTPClient:
+    def __init__(self, base_url, timeout=30.0):
+        self.base_url = base_url
+        self.timeout = timeout
+
+    def _open(self, request):
+        try:
+            with urllib.request.urlopen(request, timeout=self.timeout) as response:
+                return response.status, len(response.read())
+        except urllib.error.HTTPError as e:
+            return e.code, len(e.read())
+        except OSError:
+            # Timeouts and refused or reset connections
+            return 'error', 0
+
+    def get(self):
+        return self._open(urllib.request.Request(self.base_url + '/', headers=BROWSER_HEADERS))
+
+    def post(self, birthdate):
+        body = urllib.parse.urlencode({'birthdate': birthdate}).encode()
+        return self._open(urllib.request.Request(self.base_url + '/', data=body, headers=BROWSER_HEADERS))
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+def server_command(target, port, workers, threads, workdir):
+    if target == 'asgi':
+        return [sys.executable, os.path.join(REPO_DIR, 'asgi.py'), '--host', '127.0.0.1', '--port', str(port)]
+    return [sys.executable, '-m', 'gunicorn', '--bind', f'127.0.0.1:{port}',
+            '--workers', str(workers), '--threads', str(threads),
+            '--config', os.path.join(REPO_DIR, 'gunicorn.conf.py'),
+            '--pythonpath', REPO_DIR, '--pid', os.path.join(workdir, 'gunicorn.pid'), 'app:app']
+
+
+def start_server(workdir, target='gunicorn', workers=1, threads=8, ready_path='/', poll_interval=0.1):
+    """Start gunicorn or the asyncio server in ``workdir`` and wait until ``ready_path`` answers.
+
+    Returns (process, base_url).
+    """
+    port = free_port()
+    command = server_command(target, port, workers, threads, workdir)
+    process = subprocess.Popen(command, cwd=workdir, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE)
+    base_url = f'http://127.0.0.1:{port}'
+    deadline = time.monotonic() + 30
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f"{target} exited: {process.stderr.read().decode(errors='replace')}")
+        try:
+            urllib.request.urlopen(base_url + ready_path, timeout=1).read()
+            return process, base_url
+        except OSError:
+            time.sleep(poll_interval)
+    process.kill()
+    raise RuntimeError(f'{target} did not start within 30s')
+
+
+def stop_server(process):
+    process.send_signal(signal.SIGTERM)
+    try:
+        process.wait(timeout=30)
+    except subprocess.TimeoutExpired:
+        process.kill()
+
+
+def run_load(make_client, total, concurrency, post_ratio, seed=0):
+    """Send ``total`` requests from ``concurrency`` threads; returns the raw measurements"""
+    birthdates = random_birthdates(1000, seed)
+    per_thread = [total // concurrency + (1 if i < total % concurrency else 0) for i in range(concurrency)]
+    latencies = {'GET': [], 'POST': []}
+    statuses = {}
+    response_bytes = [0]
+    lock = threading.Lock()
+    start_barrier = threading.Barrier(concurrency + 1)
+
+    def worker(index, count):
+        rng = random.Random(seed + index)
+        client = make_client()
+        local = {'GET': [], 'POST': []}
+        local_statuses = {}
+        local_bytes = 0
+        start_barrier.wait()
+        for _ in range(count):
+            method = 'POST' if rng.random() < post_ratio else 'GET'
+            began = time.perf_counter()
+            if method == 'POST':
+                status, size = client.post(rng.choice(birthdates))
+            else:
+                status, size = client.get()
+            local[method].append(time.perf_counter() - began)
+            local_statuses[status] = local_statuses.get(status, 0) + 1
+            local_bytes += size
+        with lock:
+            for method, values in local.items():
+                latencies[method].extend(values)
+            for status, n in local_statuses.items():
+                statuses[status] = statuses.get(status, 0) + n
+            response_bytes[0] += local_bytes
+
+    threads = [threading.Thread(target=worker, args=(i, n)) for i, n in enumerate(per_thread)]
+    for thread in threads:
+        thread.start()
+    start_barrier.wait()
+    began = time.perf_counter()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - began
+    return latencies, statuses, response_bytes[0], elapsed
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split('\n', 1)[0])
+    parser.add_argument('--target', choices=('wsgi', 'gunicorn', 'asgi'), default='wsgi')
+    parser.add_argument('--requests', type=int, default=2000, help='total requests to send')
+    parser.add_argument('--concurrency', type=int, default=8, help='client threads')
+    parser.add_argument('--post-ratio', type=float, default=0.5, help='fraction of requests that are POSTs')
+    parser.add_argument('--workers', type=int, default=1, help='gunicorn workers')
+    parser.add_argument('--threads', type=int, default=8, help='gunicorn threads per worker')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--output', help='also write the JSON results here')
+    args = parser.parse_args(argv)
+    output = os.path.abspath(args.output) if args.output else None
+
+    workdir = tempfile.mkdtemp(prefix='birthdaycalc-load-')
+    process = None
+    try:
+        if args.target == 'wsgi':
+            app_module = import_app(workdir)
+            make_client = lambda: WSGIClient(app_module)  # noqa: E731
+        else:
+            process, base_url = start_server(workdir, args.target, args.workers, args.threads)
+            make_client = lambda: HTTPClient(base_url)  # noqa: E731
+        latencies, statuses, response_bytes, elapsed = run_load(
+            make_client, args.requests, args.concurrency, args.post_ratio, args.seed)
+        if process is not None:
+            stop_server(process)  # servers flush their log queues on the way out
+            process = None
+        else:
+            app_module.log_writer.flush()
+        results = {
+            'benchmark': 'load',
+            'metadata': run_metadata(),
+            'config': {k: getattr(args, k) for k in
+                       ('target', 'requests', 'concurrency', 'post_ratio', 'workers', 'threads', 'seed')},
+            'throughput_rps': round(args.requests / elapsed, 1),
+            'elapsed_s': round(elapsed, 3),
+            'latency': latency_summary(latencies['GET'] + latencies['POST']),
+            'latency_get': latency_summary(latencies['GET']),
+            'latency_post': latency_summary(latencies['POST']),
+            'statuses': {str(k): v for k, v in sorted(statuses.items(), key=lambda item: str(item[0]))},
+            'response_bytes': response_bytes,
+            'log_bytes': directory_bytes(os.path.join(workdir, 'log')),
+        }
+    finally:
+        if process is not None:
+            stop_server(process)
+        os.chdir(REPO_DIR)
+        shutil.rmtree(workdir, ignore_errors=True)
+    save_results(results, output)
+
+
+if __name__ == '__main__':
+    main()
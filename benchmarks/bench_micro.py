@@ -0,0 +1,171 @@
+"""Micro-benchmarks of the request path building blocks.
+
+    python benchmarks/bench_micro.py --output results/micro.json
+    python benchmarks/bench_micro.py --sizes 0,10000,100000 --quick
+"""
+import argparse
+import os
+import random
+import shutil
+import tempfile
+import time
+from datetime import date, timedelta
+
+from common import import_app, run_metadata, save_results, time_per_call
+
+BROWSER_HEADERS = {
+    'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) '
+                  'Chrome/126.0.0.0 Safari/537.36',
+    'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,*/*;q=0.8',
+    'Accept-Language': 'en-US,en;q=0.9',
+    'Accept-Encoding': 'gzip, deflate, br',
+    'Sec-Ch-Ua': '"Chromium";v="126", "Google Chrome";v="126", "Not-A.Brand";v="99"',
+    'Sec-Ch-Ua-Mobile': '?0',
+    'Sec-Ch-Ua-Platform': '"Windows"',
+    'X-Forwarded-For': '203.0.113.7',
+}
+
+
+def legacy_log_usage(path, line, max_entries):
+    """The original read-everything/rewrite-everything log_usage(), as a baseline"""
+    entries = []
+    if os.path.exists(path):
+        with open(path, 'r', encoding='utf-8') as f:
+            entries = f.readlines()
+    entries.append(line + '\n')
+    if len(entries) > max_entries:
+        entries = entries[-max_entries:]
+    with open(path, 'w', encoding='utf-8') as f:
+        f.writelines(entries)
+
+
+def prefill(path, count):
+    with open(path, 'w', encoding='utf-8') as f:
+        for i in range(count):
+            f.write(f"2025-08-01T12:00:00.{i % 1000000:06d} | 1990-05-01\n")
+
+
+def bench_usage_log(app, sizes, iterations):
+    from usage_log import UsageLog
+    results = []
+    for size in sizes:
+        workdir = tempfile.mkdtemp()
+        legacy_path = os.path.join(workdir, 'legacy.log')
+        prefill(legacy_path, size)
+        legacy_s = time_per_call(
+            lambda: legacy_log_usage(legacy_path, '2025-08-01T12:00:00 | 1990-05-01', app.MAX_USAGE_ENTRIES),
+            max(3, iterations // 50))
+        segmented_path = os.path.join(workdir, 'usage.log')
+        prefill(segmented_path, size)
+        usage_log = UsageLog(segmented_path, app.MAX_USAGE_ENTRIES, app.USAGE_SEGMENT_ENTRIES)
+        segmented_s = time_per_call(lambda: usage_log.append('2025-08-01T12:00:00 | 1990-05-01'), iterations)
+        usage_log.close()
+        shutil.rmtree(workdir)
+        results.append({
+            'entries': size,
+            'legacy_rewrite_us': round(legacy_s * 1e6, 2),
+            'segmented_append_us': round(segmented_s * 1e6, 2),
+        })
+    return results
+
+
+def bench_technical_log(app, iterations):
+    from flask import Request
+    from werkzeug.test import EnvironBuilder
+    environ = EnvironBuilder(path='/', method='POST', data={'birthdate': '1990-05-01'},
+                             headers=BROWSER_HEADERS).get_environ()
+    request_obj = Request(environ)
+    request_obj.form  # parse once, as Flask would before the handler runs
+    results = {
+        'capture_us': round(time_per_call(lambda: app.technical_capture.capture(request_obj), iterations) * 1e6, 2),
+        'capture_and_serialize_us': round(time_per_call(
+            lambda: app.to_json(app.technical_capture.capture(request_obj)), iterations) * 1e6, 2),
+    }
+    return results, request_obj
+
+
+def bench_enqueue(app, request_obj, iterations):
+    """What logging costs the request thread itself: capture plus a queue put"""
+    results = {
+        'log_usage_us': round(time_per_call(
+            lambda: app.log_usage('1990-05-01', '2025-08-01T12:00:00'), iterations) * 1e6, 2),
+        'log_technical_info_us': round(time_per_call(
+            lambda: app.log_technical_info(request_obj), iterations) * 1e6, 2),
+    }
+    app.log_writer.flush()
+    return results
+
+
+def bench_render(app, iterations):
+    background = app.BG_COLORS[0]
+    return {
+        'empty_form_us': round(time_per_call(lambda: app.render_page(background=background), iterations) * 1e6, 2),
+        'result_us': round(time_per_call(lambda: app.render_page(
+            age=35, birthdate='1990-05-01', background=background, days_until_birthday=120),
+            iterations) * 1e6, 2),
+    }
+
+
+def bench_compression(app, iterations):
+    """CPU per response and bytes on the wire for each way of encoding a result page"""
+    import compression
+    body = app.render_page(age=35, birthdate='1990-05-01', background=app.BG_COLORS[0],
+                           days_until_birthday=120).encode('utf-8')
+    compressor = app.response_compressor
+    level = compressor.gzip_level
+    variants = {
+        'gzip_full': lambda: compression.gzip_body(body, level),
+        'gzip_prefix': lambda: compressor.compress(body, 'gzip')[0],
+    }
+    if compression.brotli is not None:
+        variants['br'] = lambda: compressor.compress(body, 'br')[0]
+    results = {'identity_bytes': len(body), 'prefix_bytes': len(compressor.prefixes[0].prefix)}
+    for name, fn in variants.items():
+        cpu_s = time_per_call(fn, iterations, clock=time.thread_time)
+        size = len(fn())
+        results[name] = {'cpu_us': round(cpu_s * 1e6, 2), 'bytes': size, 'bytes_saved': len(body) - size}
+    results['prefix_cpu_us_saved'] = round(results['gzip_full']['cpu_us'] - results['gzip_prefix']['cpu_us'], 2)
+    return results
+
+
+def bench_age(iterations):
+    import agecalc
+    today = date.today()
+    birthdates = [(today - timedelta(days=random.randrange(46000))).isoformat() for _ in range(10000)]
+    sample = birthdates[0]
+    return {
+        'strptime_and_calculate_us': round(time_per_call(
+            lambda: agecalc.calculate_age(agecalc.parse_birthdate(sample)), iterations) * 1e6, 2),
+        'table_lookup_us': round(time_per_call(lambda: agecalc.age_result(sample), iterations) * 1e6, 2),
+        'batch_10k_ms': round(time_per_call(lambda: agecalc.batch_age_results(birthdates), 5) * 1e3, 2),
+        'numpy': agecalc.load_numpy() is not None,
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split('\n', 1)[0])
+    parser.add_argument('--sizes', default='0,10000,50000,100000', help='usage log sizes to test')
+    parser.add_argument('--iterations', type=int, default=2000)
+    parser.add_argument('--quick', action='store_true', help='fewer iterations')
+    parser.add_argument('--output', help='also write the JSON results here')
+    args = parser.parse_args(argv)
+    output = os.path.abspath(args.output) if args.output else None
+    iterations = max(10, args.iterations // 10) if args.quick else args.iterations
+
+    app = import_app()
+    technical_log, request_obj = bench_technical_log(app, iterations)
+    results = {
+        'benchmark': 'micro',
+        'metadata': run_metadata(),
+        'usage_log': bench_usage_log(app, [int(s) for s in args.sizes.split(',') if s], iterations),
+        'technical_log': technical_log,
+        'enqueue': bench_enqueue(app, request_obj, iterations),
+        'render': bench_render(app, iterations),
+        'compression': bench_compression(app, iterations),
+        'age': bench_age(iterations),
+    }
+    save_results(results, output)
+
+
+if __name__ == '__main__':
+    main()
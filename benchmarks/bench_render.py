@@ -0,0 +1,62 @@
+"""Per-request page render time: render_template_string vs the precompiled templates.
+
+    python benchmarks/bench_render.py [--iterations 2000]
+"""
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.chdir(tempfile.mkdtemp())  # keep the app's log/ directory out of the checkout
+
+from flask import render_template_string  # noqa: E402
+
+import app as birthday_app  # noqa: E402
+
+CASES = [
+    dict(age=None, birthdate='', joke=None, days_until_birthday=None),
+    dict(age=34, birthdate='1990-05-01', joke=None, days_until_birthday=195),
+]
+BACKGROUND = "linear-gradient(135deg, #667eea 0%, #764ba2 100%)"
+
+
+def time_per_call(fn, iterations):
+    fn()
+    start = time.perf_counter()
+    for _ in range(iterations):
+        fn()
+    return (time.perf_counter() - start) / iterations
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split('\n', 1)[0])
+    parser.add_argument('--iterations', type=int, default=2000)
+    args = parser.parse_args(argv)
+
+    results = []
+    with birthday_app.app.app_context():
+        for case in CASES:
+            def before():
+                # from_string() parses and compiles the whole template on every call
+                return render_template_string(birthday_app.HTML, background=BACKGROUND, **case)
+
+            def after():
+                return birthday_app.render_page(background=BACKGROUND, **case)
+
+            assert before() == after()
+            before_s = time_per_call(before, args.iterations)
+            after_s = time_per_call(after, args.iterations)
+            results.append({
+                'case': 'result' if case['age'] is not None else 'empty form',
+                'render_template_string_us': round(before_s * 1e6, 1),
+                'precompiled_us': round(after_s * 1e6, 1),
+                'speedup': round(before_s / after_s, 1),
+            })
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,95 @@
+"""Side-by-side load test of threaded gunicorn and the asyncio server.
+
+    python benchmarks/bench_servers.py --requests 4000 --concurrency 80
+    python benchmarks/bench_servers.py --slow-clients 16 --output results/servers.json
+
+Both servers get the same GET/POST mix from the same number of client
+threads.  ``--slow-clients`` additionally keeps that many connections open
+for the whole run, trickling request headers, as slow mobile clients or
+scrapers do; each of them holds a gunicorn thread but costs the event loop
+next to nothing.
+"""
+import argparse
+import os
+import shutil
+import socket
+import tempfile
+import threading
+import urllib.parse
+
+from bench_load import HTTPClient, run_load, start_server, stop_server
+from common import directory_bytes, latency_summary, run_metadata, save_results
+
+
+def hold_slow_clients(base_url, count, stop):
+    """Open ``count`` connections that send a header line every second until ``stop`` is set"""
+    address = urllib.parse.urlsplit(base_url)
+    sockets = []
+    for _ in range(count):
+        s = socket.create_connection((address.hostname, address.port))
+        s.sendall(b'GET / HTTP/1.1\r\nHost: localhost\r\n')
+        sockets.append(s)
+    while not stop.wait(1.0):
+        for s in sockets:
+            try:
+                s.sendall(b'X-Slow: 1\r\n')
+            except OSError:
+                pass
+    for s in sockets:
+        s.close()
+
+
+def run_target(target, args):
+    workdir = tempfile.mkdtemp(prefix=f'birthdaycalc-{target}-')
+    process = None
+    stop = threading.Event()
+    try:
+        process, base_url = start_server(workdir, target, args.workers, args.threads)
+        holder = threading.Thread(target=hold_slow_clients, args=(base_url, args.slow_clients, stop))
+        holder.start()
+        latencies, statuses, _, elapsed = run_load(lambda: HTTPClient(base_url, args.timeout), args.requests,
+                                                   args.concurrency, args.post_ratio, args.seed)
+        stop.set()
+        holder.join()
+        stop_server(process)
+        process = None
+        return {
+            'throughput_rps': round(args.requests / elapsed, 1),
+            'latency': latency_summary(latencies['GET'] + latencies['POST']),
+            'statuses': {str(k): v for k, v in sorted(statuses.items(), key=lambda item: str(item[0]))},
+            'log_bytes': directory_bytes(os.path.join(workdir, 'log')),
+        }
+    finally:
+        stop.set()
+        if process is not None:
+            stop_server(process)
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split('\n', 1)[0])
+    parser.add_argument('--requests', type=int, default=2000)
+    parser.add_argument('--concurrency', type=int, default=80, help='client threads (containerConcurrency)')
+    parser.add_argument('--post-ratio', type=float, default=0.5)
+    parser.add_argument('--slow-clients', type=int, default=0, help='idle connections held open during the run')
+    parser.add_argument('--timeout', type=float, default=5.0, help='client timeout per request, seconds')
+    parser.add_argument('--workers', type=int, default=1, help='gunicorn workers')
+    parser.add_argument('--threads', type=int, default=8, help='gunicorn threads per worker')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--output', help='also write the JSON results here')
+    args = parser.parse_args(argv)
+    output = os.path.abspath(args.output) if args.output else None
+
+    results = {
+        'benchmark': 'servers',
+        'metadata': run_metadata(),
+        'config': {k: getattr(args, k) for k in
+                   ('requests', 'concurrency', 'post_ratio', 'slow_clients', 'timeout', 'workers', 'threads',
+                    'seed')},
+        'servers': {target: run_target(target, args) for target in ('gunicorn', 'asgi')},
+    }
+    save_results(results, output)
+
+
+if __name__ == '__main__':
+    main()
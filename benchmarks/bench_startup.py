@@ -0,0 +1,60 @@
+"""Cold-start latency: spawn the server repeatedly and time the first response.
+
+    python benchmarks/bench_startup.py --runs 5 --output results/startup.json
+
+Each run starts a fresh server in an empty working directory, polls
+/startup until it answers and records the wall time from spawn to that
+first byte alongside the app's own startup report (import phases, warmup).
+"""
+import argparse
+import json
+import os
+import shutil
+import tempfile
+import time
+import urllib.request
+
+from bench_load import start_server, stop_server
+from common import latency_summary, run_metadata, save_results
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split('\n', 1)[0])
+    parser.add_argument('--runs', type=int, default=5)
+    parser.add_argument('--target', choices=('gunicorn', 'asgi'), default='gunicorn')
+    parser.add_argument('--output', help='also write the JSON results here')
+    args = parser.parse_args(argv)
+    output = os.path.abspath(args.output) if args.output else None
+
+    first_byte, reports = [], []
+    for _ in range(args.runs):
+        workdir = tempfile.mkdtemp(prefix='birthdaycalc-startup-')
+        try:
+            began = time.perf_counter()
+            process, base_url = start_server(workdir, args.target, ready_path='/startup', poll_interval=0.005)
+            first_byte.append(time.perf_counter() - began)
+            with urllib.request.urlopen(base_url + '/startup', timeout=5) as response:
+                reports.append(json.load(response))
+            stop_server(process)
+        finally:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+    phases = {}
+    for report in reports:
+        for name, seconds in report['phases'].items():
+            phases.setdefault(name, []).append(seconds)
+    results = {
+        'benchmark': 'startup',
+        'metadata': run_metadata(),
+        'target': args.target,
+        'runs': args.runs,
+        'spawn_to_first_byte': latency_summary(first_byte),
+        'import': latency_summary([r['import_seconds'] for r in reports]),
+        'warmup': latency_summary([r['warmup_seconds'] for r in reports if r['warmup_seconds'] is not None]),
+        'phases': {name: latency_summary(values) for name, values in phases.items()},
+    }
+    save_results(results, output)
+
+
+if __name__ == '__main__':
+    main()
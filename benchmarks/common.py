@@ -0,0 +1,83 @@
+"""Helpers shared by the benchmark scripts."""
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def import_app(workdir=None):
+    """Import app.py with its log/ directory in a scratch working directory"""
+    if REPO_DIR not in sys.path:
+        sys.path.insert(0, REPO_DIR)
+    os.chdir(workdir or tempfile.mkdtemp(prefix='birthdaycalc-bench-'))
+    import app
+    return app
+
+
+def percentile(sorted_values, fraction):
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, max(0, int(round(fraction * (len(sorted_values) - 1)))))
+    return sorted_values[index]
+
+
+def latency_summary(latencies):
+    """Count, mean and p50/p95/p99 in milliseconds of a list of seconds"""
+    values = sorted(latencies)
+    return {
+        'count': len(values),
+        'mean_ms': round(1000 * sum(values) / len(values), 3) if values else 0.0,
+        'p50_ms': round(1000 * percentile(values, 0.50), 3),
+        'p95_ms': round(1000 * percentile(values, 0.95), 3),
+        'p99_ms': round(1000 * percentile(values, 0.99), 3),
+    }
+
+
+def time_per_call(fn, iterations, warmup=1, clock=time.perf_counter):
+    """Mean seconds per call of ``fn`` over ``iterations`` calls, by ``clock``"""
+    for _ in range(warmup):
+        fn()
+    start = clock()
+    for _ in range(iterations):
+        fn()
+    return (clock() - start) / iterations
+
+
+def directory_bytes(path):
+    total = 0
+    for root, _, files in os.walk(path):
+        for name in files:
+            try:
+                total += os.path.getsize(os.path.join(root, name))
+            except OSError:
+                pass
+    return total
+
+
+def run_metadata():
+    try:
+        commit = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=REPO_DIR,
+                                capture_output=True, text=True).stdout.strip()
+    except OSError:
+        commit = None
+    return {
+        'commit': commit or None,
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'cpus': os.cpu_count(),
+        'time': time.strftime('%Y-%m-%dT%H:%M:%S'),
+    }
+
+
+def save_results(results, output):
+    """Print results as JSON and, if ``output`` is given, also write them there"""
+    text = json.dumps(results, indent=2)
+    print(text)
+    if output:
+        with open(output, 'w', encoding='utf-8') as f:
+            f.write(text + '\n')
@@ -0,0 +1,81 @@
+"""Compare two benchmark result files and flag regressions.
+
+    python benchmarks/compare.py results/baseline.json results/current.json --threshold 0.10
+
+Timings (``*_us``, ``*_ms``, ``*_s``) and byte counts are lower-is-better,
+``*_rps`` and savings (``*_saved``) are higher-is-better.  Exits 1 when any metric got worse by more
+than the threshold.
+"""
+import argparse
+import json
+import sys
+
+SKIP = {'metadata', 'config'}
+LOWER_IS_BETTER = ('_us', '_ms', '_s', 'bytes')
+HIGHER_IS_BETTER = ('_rps', '_saved')
+
+
+def flatten(value, prefix=''):
+    """``{'a': {'b': 1}, 'c': [{'d': 2}]}`` -> ``{'a.b': 1, 'c.0.d': 2}``, numbers only"""
+    if isinstance(value, dict):
+        items = value.items()
+    elif isinstance(value, list):
+        items = ((item.get('entries', i) if isinstance(item, dict) else i, item) for i, item in enumerate(value))
+    else:
+        if isinstance(value, (int, float)) and not isinstance(value, bool):
+            return {prefix: value}
+        return {}
+    flat = {}
+    for key, item in items:
+        if not prefix and key in SKIP:
+            continue
+        flat.update(flatten(item, f"{prefix}.{key}" if prefix else str(key)))
+    return flat
+
+
+def direction(name):
+    leaf = name.rsplit('.', 1)[-1]
+    if leaf.endswith(HIGHER_IS_BETTER):
+        return 1
+    if leaf.endswith(LOWER_IS_BETTER):
+        return -1
+    return 0
+
+
+def compare(baseline, current, threshold):
+    """Rows of (name, baseline, current, relative change, regressed)"""
+    before, after = flatten(baseline), flatten(current)
+    rows = []
+    for name in sorted(before.keys() & after.keys()):
+        sign = direction(name)
+        if sign == 0:
+            continue
+        old, new = before[name], after[name]
+        change = (new - old) / old if old else 0.0
+        rows.append((name, old, new, change, -sign * change > threshold))
+    return rows
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split('\n', 1)[0])
+    parser.add_argument('baseline')
+    parser.add_argument('current')
+    parser.add_argument('--threshold', type=float, default=0.10, help='allowed relative slowdown (0.10 = 10%%)')
+    args = parser.parse_args(argv)
+
+    with open(args.baseline, encoding='utf-8') as f:
+        baseline = json.load(f)
+    with open(args.current, encoding='utf-8') as f:
+        current = json.load(f)
+    rows = compare(baseline, current, args.threshold)
+    regressions = 0
+    for name, old, new, change, regressed in rows:
+        regressions += regressed
+        flag = 'REGRESSION' if regressed else ''
+        print(f"{name:<45} {old:>12} {new:>12} {change:>+8.1%}  {flag}")
+    print(f"\n{regressions} regression(s) over {args.threshold:.0%} in {len(rows)} metrics")
+    return 1 if regressions else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
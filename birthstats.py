@@ -0,0 +1,236 @@
+"""Birthdate histogram maintained incrementally as the calculator is used.
+
+Counts live in an array with one slot per day of the form's window (Jan 1
+of ``year - MAX_AGE`` onwards, grown as new years start), plus running
+totals by year, month and weekday and an ``invalid`` bucket, so recording a
+birthdate and answering a stats query never rescan any log.
+
+Each worker process keeps its own counts and snapshots them to
+``birthstats-<pid>.json``; ``merge_logs.py --compact`` folds the snapshots
+of exited workers into ``birthstats.json``.
+"""
+import json
+import os
+import threading
+import time
+from array import array
+from datetime import date
+
+from agecalc import MAX_AGE, WEEKDAYS, current_table, parse_birthdate
+from usage_log import find_shards, shard_path
+
+MONTHS = ['January', 'February', 'March', 'April', 'May', 'June', 'July',
+          'August', 'September', 'October', 'November', 'December']
+
+
+class BirthdateHistogram:
+    """Array-backed birthdate counters with running aggregates"""
+
+    def __init__(self, first_year=None):
+        self.first_year = first_year or date.today().year - MAX_AGE
+        self.first_ordinal = date(self.first_year, 1, 1).toordinal()
+        self.daily = array('L')
+        self.by_year = array('L')
+        self.by_month = array('L', [0] * 12)
+        self.by_weekday = array('L', [0] * 7)
+        self.total = 0
+        self.invalid = 0
+        self.outside_window = 0
+        # Offsets of days with a count, so a sparse histogram is summed without a full scan
+        self.touched = set()
+        self._grow(date.today().year)
+
+    def _grow(self, year):
+        """Extend the arrays to cover every day through Dec 31 of ``year``"""
+        days = date(year, 12, 31).toordinal() - self.first_ordinal + 1
+        if days > len(self.daily):
+            self.daily.extend([0] * (days - len(self.daily)))
+            self.by_year.extend([0] * (year - self.first_year + 1 - len(self.by_year)))
+
+    def add_ordinal(self, ordinal, count=1):
+        """Count a valid birthdate given as a proleptic Gregorian ordinal"""
+        self.total += count
+        offset = ordinal - self.first_ordinal
+        if offset < 0:
+            self.outside_window += count
+            return
+        if offset >= len(self.daily):
+            bdate = date.fromordinal(ordinal)
+            if bdate.year > date.today().year:
+                self.outside_window += count
+                return
+            self._grow(bdate.year)
+        bdate = date.fromordinal(ordinal)
+        self.daily[offset] += count
+        self.touched.add(offset)
+        self.by_year[bdate.year - self.first_year] += count
+        self.by_month[bdate.month - 1] += count
+        self.by_weekday[bdate.weekday()] += count
+
+    def add(self, birthdate):
+        """Count one submitted birthdate string, valid or not"""
+        table = current_table()
+        i = table.lookup(birthdate)
+        if i is not None:
+            self.add_ordinal(table.first.toordinal() + i)
+            return
+        try:
+            self.add_ordinal(parse_birthdate(birthdate).toordinal())
+        except ValueError:
+            self.total += 1
+            self.invalid += 1
+
+    def merge(self, other):
+        """Add the counts of another histogram into this one"""
+        for offset, count in enumerate(other.daily):
+            if count:
+                self.add_ordinal(other.first_ordinal + offset, count)
+        self.total += other.invalid + other.outside_window
+        self.invalid += other.invalid
+        self.outside_window += other.outside_window
+
+    def to_dict(self):
+        return {
+            'first_year': self.first_year,
+            'daily': {date.fromordinal(self.first_ordinal + i).isoformat(): c
+                      for i, c in enumerate(self.daily) if c},
+            'invalid': self.invalid,
+            'outside_window': self.outside_window,
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        histogram = cls(data.get('first_year'))
+        for day, count in data.get('daily', {}).items():
+            histogram.add_ordinal(date.fromisoformat(day).toordinal(), count)
+        histogram.total += data.get('invalid', 0) + data.get('outside_window', 0)
+        histogram.invalid = data.get('invalid', 0)
+        histogram.outside_window = data.get('outside_window', 0)
+        return histogram
+
+    def years(self):
+        """``{year: count}`` for every year with a count"""
+        return {self.first_year + i: c for i, c in enumerate(self.by_year) if c}
+
+    def ranked_days(self):
+        """``(count, ordinal)`` of every day with a count, highest first"""
+        return sorted(((self.daily[i], self.first_ordinal + i) for i in self.touched), reverse=True)
+
+    def count_on(self, ordinal):
+        offset = ordinal - self.first_ordinal
+        return self.daily[offset] if 0 <= offset < len(self.daily) else 0
+
+    def summary(self, top=10):
+        """Aggregate counts as a JSON-ready dict"""
+        return format_summary(self.total, self.invalid, self.outside_window, self.years(),
+                              self.by_month, self.by_weekday, self.ranked_days()[:top])
+
+
+def format_summary(total, invalid, outside_window, years, by_month, by_weekday, top_days):
+    return {
+        'total': total,
+        'invalid': invalid,
+        'outside_window': outside_window,
+        'by_year': {str(year): years[year] for year in sorted(years)},
+        'by_month': dict(zip(MONTHS, by_month)),
+        'by_weekday': dict(zip(WEEKDAYS, by_weekday)),
+        'top_dates': [{'date': date.fromordinal(ordinal).isoformat(), 'count': c} for c, ordinal in top_days],
+    }
+
+
+def load_histogram(path):
+    with open(path, 'r', encoding='utf-8') as f:
+        return BirthdateHistogram.from_dict(json.load(f))
+
+
+def save_histogram(histogram, path):
+    tmp = path + '.tmp'
+    with open(tmp, 'w', encoding='utf-8') as f:
+        json.dump(histogram.to_dict(), f, separators=(',', ':'))
+    os.replace(tmp, path)
+
+
+class BirthStatsStore:
+    """This process's histogram plus the snapshots of the base file and other workers"""
+
+    def __init__(self, path, snapshot_interval=30.0):
+        self.path = path
+        self.snapshot_interval = snapshot_interval
+        self.own = None
+        self._pid = None
+        self._dirty = False
+        self._last_snapshot = time.monotonic()
+        self._others = None
+        self._others_loaded = 0.0
+        self._lock = threading.Lock()
+
+    def _histogram(self):
+        if self._pid != os.getpid():
+            self.own = BirthdateHistogram()
+            self._pid = os.getpid()
+        return self.own
+
+    def add(self, birthdate):
+        """Record a birthdate in O(1); returns True when a snapshot is due"""
+        with self._lock:
+            self._histogram().add(birthdate)
+            self._dirty = True
+            return time.monotonic() - self._last_snapshot >= self.snapshot_interval
+
+    def snapshot(self):
+        """Persist this process's counts to its shard file if they changed"""
+        with self._lock:
+            if not self._dirty:
+                return
+            data = self._histogram().to_dict()
+            self._dirty = False
+            self._last_snapshot = time.monotonic()
+        tmp = shard_path(self.path) + '.tmp'
+        with open(tmp, 'w', encoding='utf-8') as f:
+            json.dump(data, f, separators=(',', ':'))
+        os.replace(tmp, shard_path(self.path))
+
+    def _other_counts(self):
+        # Base file and other workers' snapshots, re-read at most once per interval;
+        # returns the merged histogram and its ranked days, swapped in together
+        if self._others is None or time.monotonic() - self._others_loaded >= self.snapshot_interval:
+            others = BirthdateHistogram()
+            paths = [p for sid, p in find_shards(self.path).items() if sid != str(os.getpid())]
+            if os.path.exists(self.path):
+                paths.append(self.path)
+            for path in paths:
+                try:
+                    others.merge(load_histogram(path))
+                except (OSError, ValueError) as e:
+                    print(f"Error loading birthdate stats {path}: {e}")
+            self._others = (others, others.ranked_days())
+            self._others_loaded = time.monotonic()
+        return self._others
+
+    def summary(self, top=10):
+        """Other processes' cached aggregates plus this process's live counts.
+
+        Year, month and weekday totals are added element-wise.  The top
+        dates come from this process's days (summed with the others' counts)
+        and the others' best days this process has not seen, which is exact.
+        """
+        others, others_ranked = self._other_counts()
+        with self._lock:
+            own = self._histogram()
+            own_days = {own.first_ordinal + i: own.daily[i] for i in own.touched}
+            own_years = own.years()
+            by_month = [a + b for a, b in zip(others.by_month, own.by_month)]
+            by_weekday = [a + b for a, b in zip(others.by_weekday, own.by_weekday)]
+            totals = (others.total + own.total, others.invalid + own.invalid,
+                      others.outside_window + own.outside_window)
+        years = others.years()
+        for year, count in own_years.items():
+            years[year] = years.get(year, 0) + count
+        candidates = {ordinal: count + others.count_on(ordinal) for ordinal, count in own_days.items()}
+        for count, ordinal in others_ranked:
+            if len(candidates) >= top + len(own_days):
+                break
+            if ordinal not in candidates:
+                candidates[ordinal] = count
+        top_days = sorted(((c, ordinal) for ordinal, c in candidates.items()), reverse=True)[:top]
+        return format_summary(*totals, years, by_month, by_weekday, top_days)
@@ -0,0 +1,137 @@
+"""Compute ages for large CSV or JSONL files of birthdates.
+
+Input lines are streamed through in chunks, so memory stays constant regardless
+of file size.  Each chunk is parsed, aged and formatted by a process pool worker
+and written in input order with extra ``age``, ``over_max_age``,
+``days_until_birthday`` and ``error`` fields.  CSV fields must not contain embedded newlines.
+A JSONL line that is not a JSON object is written back as ``{"line": ...}`` with
+the parse failure in ``error``, like an invalid date.
+
+    python bulk_ages.py people.csv --output ages.csv
+    python bulk_ages.py people.jsonl --column dob --workers 4 > ages.jsonl
+"""
+import argparse
+import csv
+import io
+import itertools
+import json
+import os
+import sys
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from datetime import date
+
+from agecalc import batch_age_results
+
+RESULT_FIELDS = ['age', 'over_max_age', 'days_until_birthday', 'error']
+
+
+def chunked(lines, size):
+    iterator = iter(lines)
+    while True:
+        chunk = list(itertools.islice(iterator, size))
+        if not chunk:
+            return
+        yield chunk
+
+
+def parse_json_row(line):
+    """``(row, None)`` for a JSON object line, else ``({'line': raw line}, reason)``"""
+    try:
+        row = json.loads(line)
+    except ValueError as e:
+        return {'line': line.rstrip('\r\n')}, f"invalid JSON: {e}"
+    if not isinstance(row, dict):
+        return {'line': line.rstrip('\r\n')}, 'line is not a JSON object'
+    return row, None
+
+
+def process_chunk(lines, fmt, fieldnames, column, today_iso):
+    """Worker: parse a chunk of raw input lines, compute ages and return the output text"""
+    today = date.fromisoformat(today_iso)
+    out = io.StringIO()
+    parse_errors = {}
+    if fmt == 'csv':
+        # Blank lines are skipped, as in JSONL
+        rows = [dict(zip(fieldnames, values)) for values in csv.reader(lines) if values]
+    else:
+        rows = []
+        for line in lines:
+            if line.strip():
+                row, error = parse_json_row(line)
+                if error is not None:
+                    parse_errors[len(rows)] = error
+                rows.append(row)
+    results = batch_age_results([None if i in parse_errors else row.get(column) for i, row in enumerate(rows)],
+                                today)
+    for i, error in parse_errors.items():
+        results[i] = dict(results[i], error=error)
+    if fmt == 'csv':
+        writer = csv.writer(out)
+        for row, result in zip(rows, results):
+            writer.writerow([row.get(name) for name in fieldnames] + [result[k] for k in RESULT_FIELDS])
+    else:
+        for row, result in zip(rows, results):
+            row.update((k, result[k]) for k in RESULT_FIELDS)
+            out.write(json.dumps(row, separators=(',', ':')) + '\n')
+    return len(rows), out.getvalue()
+
+
+def process(chunks, workers, *args):
+    """Yield ``(row_count, output_text)`` per chunk in input order, with a bounded number in flight"""
+    if workers <= 1:
+        for lines in chunks:
+            yield process_chunk(lines, *args)
+        return
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        pending = deque()
+        for lines in chunks:
+            pending.append(pool.submit(process_chunk, lines, *args))
+            if len(pending) >= workers * 2:
+                yield pending.popleft().result()
+        while pending:
+            yield pending.popleft().result()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split('\n', 1)[0])
+    parser.add_argument('input', help="CSV or JSONL file, or '-' for stdin")
+    parser.add_argument('--format', choices=['csv', 'jsonl'], help='default: from the file extension')
+    parser.add_argument('--column', default='birthdate', help='CSV column / JSON key holding the birthdate')
+    parser.add_argument('--output', help='default: stdout')
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1)
+    parser.add_argument('--chunk-size', type=int, default=20000)
+    parser.add_argument('--today', type=date.fromisoformat, default=date.today(),
+                        help='compute ages as of this YYYY-MM-DD date')
+    args = parser.parse_args(argv)
+
+    fmt = args.format or ('jsonl' if args.input.endswith(('.jsonl', '.ndjson', '.json')) else 'csv')
+    infile = sys.stdin if args.input == '-' else open(args.input, 'r', encoding='utf-8', newline='')
+    outfile = sys.stdout if args.output is None else open(args.output, 'w', encoding='utf-8', newline='')
+
+    start = time.perf_counter()
+    rows_done = 0
+    try:
+        fieldnames = None
+        if fmt == 'csv':
+            fieldnames = next(csv.reader([infile.readline()]), [])
+            csv.writer(outfile).writerow(fieldnames + RESULT_FIELDS)
+        chunks = chunked(infile, args.chunk_size)
+        for count, text in process(chunks, args.workers, fmt, fieldnames, args.column, args.today.isoformat()):
+            outfile.write(text)
+            rows_done += count
+    finally:
+        if infile is not sys.stdin:
+            infile.close()
+        if outfile is not sys.stdout:
+            outfile.close()
+
+    elapsed = time.perf_counter() - start
+    rate = rows_done / elapsed if elapsed > 0 else 0.0
+    print(f"{rows_done} rows in {elapsed:.2f}s ({rate:,.0f} rows/s, {args.workers} workers)", file=sys.stderr)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
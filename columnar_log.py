@@ -0,0 +1,225 @@
+"""Compact columnar storage for technical log records.
+
+Records are grouped into blocks.  Within a block every field becomes a column
+whose values are dictionary-encoded (each distinct value stored once, rows
+refer to it by index) and each column is zlib-compressed on its own, so a scan
+of a few fields only decompresses those columns.
+
+File layout: ``MAGIC`` then blocks of
+``[u32 header length][header JSON][column blob]...`` where the header is
+``{"n": rows, "columns": [[name, blob length], ...]}`` and each blob is
+``zlib(JSON [values, codes])`` with code -1 for a missing field.
+
+    python columnar_log.py convert log/techx.json log/techx.cols
+    python columnar_log.py cat log/techx.cols > techx.json
+    python columnar_log.py cat log/techx.cols --fields timestamp,User-Agent
+"""
+import argparse
+import glob
+import json
+import os
+import struct
+import sys
+import threading
+import time
+import zlib
+
+MAGIC = b'BDCOLS1\n'
+HEADER_LENGTH = struct.Struct('>I')
+
+
+def encode_block(records):
+    """Encode a list of dicts as one columnar block"""
+    names = []
+    seen = set()
+    for record in records:
+        for name in record:
+            if name not in seen:
+                seen.add(name)
+                names.append(name)
+    blobs = []
+    for name in names:
+        values, codes, positions = [], [], {}
+        for record in records:
+            if name not in record:
+                codes.append(-1)
+                continue
+            value = record[name]
+            key = value if isinstance(value, (str, int, float, bool)) else json.dumps(value, sort_keys=True)
+            key = (type(value).__name__, key)
+            if key not in positions:
+                positions[key] = len(values)
+                values.append(value)
+            codes.append(positions[key])
+        blobs.append(zlib.compress(json.dumps([values, codes], separators=(',', ':')).encode('utf-8'), 9))
+    header = json.dumps({'n': len(records), 'columns': [[n, len(b)] for n, b in zip(names, blobs)]},
+                        separators=(',', ':')).encode('utf-8')
+    return HEADER_LENGTH.pack(len(header)) + header + b''.join(blobs)
+
+
+def iter_blocks(f):
+    """Yield ``(header, {name: blob})`` for every block of an open file"""
+    if f.read(len(MAGIC)) != MAGIC:
+        raise ValueError("not a columnar log file")
+    while True:
+        prefix = f.read(HEADER_LENGTH.size)
+        if len(prefix) < HEADER_LENGTH.size:
+            return
+        header = json.loads(f.read(HEADER_LENGTH.unpack(prefix)[0]))
+        blobs = {name: f.read(length) for name, length in header['columns']}
+        yield header, blobs
+
+
+def decode_column(blob):
+    values, codes = json.loads(zlib.decompress(blob))
+    return [values[c] if c >= 0 else None for c in codes], codes
+
+
+def iter_records(path, fields=None):
+    """Yield the records of a columnar file as dicts, optionally only some fields"""
+    with open(path, 'rb') as f:
+        for header, blobs in iter_blocks(f):
+            names = [n for n in blobs if fields is None or n in fields]
+            columns = [(name,) + decode_column(blobs[name]) for name in names]
+            for row in range(header['n']):
+                yield {name: values[row] for name, values, codes in columns if codes[row] >= 0}
+
+
+def convert(ndjson_path, columnar_path, block_records=1000):
+    """Rewrite an NDJSON technical log in columnar form; returns (records, bytes in, bytes out)"""
+    count = 0
+    with open(ndjson_path, 'r', encoding='utf-8') as src, open(columnar_path, 'wb') as dst:
+        dst.write(MAGIC)
+        block = []
+        for line in src:
+            if not line.strip():
+                continue
+            block.append(json.loads(line))
+            count += 1
+            if len(block) >= block_records:
+                dst.write(encode_block(block))
+                block = []
+        if block:
+            dst.write(encode_block(block))
+    return count, os.path.getsize(ndjson_path), os.path.getsize(columnar_path)
+
+
+class ColumnarFileSink:
+    """Technical log sink writing columnar blocks of ``block_records`` records.
+
+    Buffered records are written as a (smaller) block on ``flush()``, and
+    by ``write_expired()`` once the oldest has waited ``max_block_age``
+    seconds, so a quiet process does not hold records in memory for hours.
+    Full files are rotated to ``path.<n>`` and the oldest are removed to stay
+    within ``max_bytes``.
+    """
+
+    def __init__(self, path, max_bytes, block_records=1000, segment_bytes=None, max_block_age=60.0):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.block_records = block_records
+        self.segment_bytes = segment_bytes or max(1, max_bytes // 8)
+        self.max_block_age = max_block_age
+        self._pending = []
+        self._pending_since = None
+        self._size = None
+        self._segments = []
+        self._lock = threading.Lock()
+
+    def _open(self):
+        for candidate in glob.glob(f"{glob.escape(self.path)}.*"):
+            number = candidate[len(self.path) + 1:]
+            if number.isdigit():
+                self._segments.append((int(number), candidate, os.path.getsize(candidate)))
+        self._segments.sort()
+        if not os.path.exists(self.path) or os.path.getsize(self.path) == 0:
+            with open(self.path, 'wb') as f:
+                f.write(MAGIC)
+        self._size = os.path.getsize(self.path)
+
+    def _write_block(self):
+        if self._size is None:
+            self._open()
+        data = encode_block(self._pending)
+        self._pending = []
+        self._pending_since = None
+        with open(self.path, 'ab') as f:
+            f.write(data)
+        self._size += len(data)
+        if self._size >= self.segment_bytes:
+            number = self._segments[-1][0] + 1 if self._segments else 1
+            target = f"{self.path}.{number}"
+            os.replace(self.path, target)
+            self._segments.append((number, target, self._size))
+            with open(self.path, 'wb') as f:
+                f.write(MAGIC)
+            self._size = len(MAGIC)
+            while self._segments and sum(s[2] for s in self._segments) + self.segment_bytes > self.max_bytes:
+                os.remove(self._segments.pop(0)[1])
+
+    def write_records(self, records):
+        with self._lock:
+            if not self._pending:
+                self._pending_since = time.monotonic()
+            self._pending.extend(records)
+            while len(self._pending) >= self.block_records:
+                rest = self._pending[self.block_records:]
+                self._pending = self._pending[:self.block_records]
+                self._write_block()
+                self._pending = rest
+                if rest:
+                    self._pending_since = time.monotonic()
+            self._write_if_expired()
+
+    def _write_if_expired(self):
+        if self._pending and time.monotonic() - self._pending_since >= self.max_block_age:
+            self._write_block()
+
+    def write_expired(self):
+        """Write the buffered records as a block if the oldest is ``max_block_age`` old"""
+        with self._lock:
+            self._write_if_expired()
+
+    def open(self):
+        """Create the file and scan old segments now rather than on the first block"""
+        with self._lock:
+            if self._size is None:
+                self._open()
+
+    def flush(self):
+        with self._lock:
+            if self._pending:
+                self._write_block()
+
+    def bytes_used(self):
+        return (self._size or 0) + sum(s[2] for s in self._segments)
+
+    def close(self):
+        self.flush()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split('\n', 1)[0])
+    commands = parser.add_subparsers(dest='command', required=True)
+    convert_cmd = commands.add_parser('convert', help='NDJSON technical log -> columnar file')
+    convert_cmd.add_argument('source')
+    convert_cmd.add_argument('target')
+    convert_cmd.add_argument('--block-records', type=int, default=1000)
+    cat_cmd = commands.add_parser('cat', help='columnar file -> NDJSON on stdout')
+    cat_cmd.add_argument('source')
+    cat_cmd.add_argument('--fields', help='comma-separated fields to decode (default: all)')
+    args = parser.parse_args(argv)
+
+    if args.command == 'convert':
+        count, size_in, size_out = convert(args.source, args.target, args.block_records)
+        ratio = size_in / size_out if size_out else 0.0
+        print(f"{count} records: {size_in} -> {size_out} bytes ({ratio:.1f}x smaller)", file=sys.stderr)
+    else:
+        fields = set(args.fields.split(',')) if args.fields else None
+        for record in iter_records(args.source, fields):
+            sys.stdout.write(json.dumps(record, separators=(',', ':'), ensure_ascii=False) + '\n')
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,120 @@
+"""Response compression with precompressed page prefixes.
+
+``ResponseCompressor`` encodes a response body with brotli when the client
+accepts it and the module is installed, otherwise gzip.  Small bodies,
+streamed responses and responses that already chose an encoding are left
+alone.
+
+Rendered pages begin with a long run of bytes that depends only on the
+background colour.  For each registered prefix the deflate state after
+compressing it (flushed with Z_SYNC_FLUSH, so it ends on a byte boundary) is
+kept; a request copies that state and compresses only its own tail, then
+wraps the raw deflate stream in a gzip header and a trailer whose CRC-32
+continues from the prefix's.  Resuming costs an extra block header and a
+state copy, so it pays off when the prefix is a good part of the body.
+"""
+import struct
+import time
+import zlib
+
+try:
+    import brotli
+except ImportError:  # brotli is optional; gzip is always available
+    brotli = None
+
+# Magic, deflate, no flags, mtime 0, no extra flags, unknown OS
+GZIP_HEADER = b'\x1f\x8b\x08\x00\x00\x00\x00\x00\x00\xff'
+PREFIX_MEM_LEVEL = 5
+COMPRESSIBLE_TYPES = ('text/', 'application/json', 'application/x-ndjson', 'application/javascript',
+                      'image/svg+xml')
+
+
+class CompressedPrefix:
+    """Deflate state after ``prefix``, ready to be resumed for any body starting with it"""
+
+    def __init__(self, prefix, level=6):
+        self.prefix = prefix
+        # copy() duplicates the window, hash table and block buffer, so size them
+        # for a page rather than zlib's defaults: the window just covers a tail
+        # as long as the prefix, and memLevel 5 compresses a page to the same
+        # bytes with a quarter of the state to copy
+        wbits = min(zlib.MAX_WBITS, max(9, (2 * len(prefix)).bit_length()))
+        self._compressor = zlib.compressobj(level, zlib.DEFLATED, -wbits, PREFIX_MEM_LEVEL)
+        self.deflated = self._compressor.compress(prefix) + self._compressor.flush(zlib.Z_SYNC_FLUSH)
+        self.crc = zlib.crc32(prefix)
+
+    def gzip(self, body):
+        """A complete gzip member for ``body``, which must start with the prefix"""
+        tail = body[len(self.prefix):]
+        compressor = self._compressor.copy()
+        deflated = compressor.compress(tail) + compressor.flush()
+        trailer = struct.pack('<II', zlib.crc32(tail, self.crc), len(body) & 0xffffffff)
+        return b''.join((GZIP_HEADER, self.deflated, deflated, trailer))
+
+
+def gzip_body(body, level=6):
+    """gzip ``body`` in one go, with the same header as ``CompressedPrefix.gzip()``"""
+    compressor = zlib.compressobj(level, zlib.DEFLATED, -zlib.MAX_WBITS)
+    deflated = compressor.compress(body) + compressor.flush()
+    return b''.join((GZIP_HEADER, deflated, struct.pack('<II', zlib.crc32(body), len(body) & 0xffffffff)))
+
+
+class ResponseCompressor:
+    """Negotiate and apply a Content-Encoding to buffered responses"""
+
+    def __init__(self, min_size=512, gzip_level=6, brotli_quality=4):
+        self.min_size = min_size
+        self.gzip_level = gzip_level
+        self.brotli_quality = brotli_quality
+        self.encodings = ['br', 'gzip'] if brotli is not None else ['gzip']
+        self.prefixes = []
+
+    def add_prefix(self, prefix):
+        """Precompress ``prefix``; bodies starting with it only pay for their tail"""
+        self.prefixes.append(CompressedPrefix(prefix, self.gzip_level))
+
+    def compress(self, body, encoding):
+        """``body`` encoded with ``encoding``; returns (encoded body, used a cached prefix)"""
+        if encoding == 'br':
+            return brotli.compress(body, quality=self.brotli_quality), False
+        for prefix in self.prefixes:
+            if body.startswith(prefix.prefix):
+                return prefix.gzip(body), True
+        return gzip_body(body, self.gzip_level), False
+
+    def eligible(self, response):
+        if response.is_streamed or response.direct_passthrough:
+            return False
+        if response.status_code < 200 or response.status_code in (204, 206, 304):
+            return False
+        if 'Content-Encoding' in response.headers or 'no-transform' in response.headers.get('Cache-Control', ''):
+            return False
+        # A response with a validator chose its representation itself
+        if 'ETag' in response.headers:
+            return False
+        return (response.mimetype or '').startswith(COMPRESSIBLE_TYPES)
+
+    def compress_response(self, response, accept_encodings):
+        """Encode ``response`` in place if worthwhile.
+
+        Returns None when it was left alone, else a dict with the encoding,
+        ``bytes_in``, ``bytes_out``, ``cpu_seconds`` and ``prefix_hit``.
+        """
+        if not self.eligible(response):
+            return None
+        body = response.get_data()
+        if len(body) < self.min_size:
+            return None
+        response.vary.add('Accept-Encoding')
+        encoding = accept_encodings.best_match(self.encodings)
+        if encoding is None:
+            return None
+        start = time.thread_time()
+        encoded, prefix_hit = self.compress(body, encoding)
+        cpu_seconds = time.thread_time() - start
+        if len(encoded) >= len(body):
+            return None
+        response.set_data(encoded)
+        response.headers['Content-Encoding'] = encoding
+        return {'encoding': encoding, 'bytes_in': len(body), 'bytes_out': len(encoded),
+                'cpu_seconds': cpu_seconds, 'prefix_hit': prefix_hit}
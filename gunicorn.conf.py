@@ -0,0 +1,17 @@
+# Picked up automatically by gunicorn from the working directory
+
+
+def worker_exit(server, worker):
+    """Drain queued log records before a worker goes away"""
+    import sys
+    app_module = sys.modules.get('app')
+    if app_module is not None:
+        app_module.log_writer.flush()
+
+
+def post_worker_init(worker):
+    """Open log sinks and warm the request path before the worker accepts connections"""
+    import sys
+    app_module = sys.modules.get('app')
+    if app_module is not None:
+        app_module.warmup()
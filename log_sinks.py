@@ -0,0 +1,145 @@
+"""Log sink backends.
+
+Every sink takes batches of already formatted lines through ``write(lines)``,
+writes out anything it buffers on ``flush()`` and reports the bytes it
+currently holds through ``bytes_used()``.  On Cloud Run the filesystem lives
+in memory, so these bytes count against the container's memory limit.
+"""
+import glob
+import gzip
+import os
+import sys
+import threading
+from collections import deque
+
+
+class RotatingCompressedFileSink:
+    """Append to ``path``, gzip it into ``path.<n>.gz`` every ``segment_bytes``,
+    and delete the oldest compressed segments to stay within ``max_bytes``."""
+
+    def __init__(self, path, max_bytes, segment_bytes=None):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.segment_bytes = segment_bytes or max(1, max_bytes // 8)
+        self._file = None
+        self._size = 0
+        self._segments = deque()
+        self._segment_bytes_total = 0
+        self._lock = threading.Lock()
+
+    def _open(self):
+        numbered = []
+        for candidate in glob.glob(f"{glob.escape(self.path)}.*.gz"):
+            number = candidate[len(self.path) + 1:-3]
+            if number.isdigit():
+                numbered.append((int(number), candidate))
+        for number, candidate in sorted(numbered):
+            size = os.path.getsize(candidate)
+            self._segments.append((number, candidate, size))
+            self._segment_bytes_total += size
+        self._file = open(self.path, 'a', encoding='utf-8')
+        self._size = self._file.tell()
+
+    def _rotate(self):
+        self._file.close()
+        number = self._segments[-1][0] + 1 if self._segments else 1
+        target = f"{self.path}.{number}.gz"
+        with open(self.path, 'rb') as src, gzip.open(target, 'wb') as dst:
+            dst.write(src.read())
+        os.remove(self.path)
+        size = os.path.getsize(target)
+        self._segments.append((number, target, size))
+        self._segment_bytes_total += size
+        self._file = open(self.path, 'a', encoding='utf-8')
+        self._size = 0
+        while self._segments and self._segment_bytes_total + self.segment_bytes > self.max_bytes:
+            _, oldest, oldest_size = self._segments.popleft()
+            os.remove(oldest)
+            self._segment_bytes_total -= oldest_size
+
+    def write(self, lines):
+        with self._lock:
+            if self._file is None:
+                self._open()
+            data = ''.join(line + '\n' for line in lines)
+            self._file.write(data)
+            self._file.flush()
+            self._size += len(data.encode('utf-8'))
+            if self._size >= self.segment_bytes:
+                self._rotate()
+
+    def open(self):
+        """Open the file now rather than on the first write"""
+        with self._lock:
+            if self._file is None:
+                self._open()
+
+    def flush(self):
+        pass
+
+    def bytes_used(self):
+        return self._size + self._segment_bytes_total
+
+    def close(self):
+        with self._lock:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+
+
+class StdoutSink:
+    """Structured NDJSON to stdout, picked up by Cloud Logging; holds no bytes"""
+
+    def __init__(self, stream=None):
+        self.stream = stream or sys.stdout
+        self.bytes_written = 0
+        self._lock = threading.Lock()
+
+    def write(self, lines):
+        data = ''.join(line + '\n' for line in lines)
+        with self._lock:
+            self.stream.write(data)
+            self.stream.flush()
+            self.bytes_written += len(data)
+
+    def flush(self):
+        pass
+
+    def bytes_used(self):
+        return 0
+
+    def close(self):
+        pass
+
+
+class MemoryRingSink:
+    """Keep the most recent lines in memory, evicting the oldest beyond ``max_bytes``"""
+
+    def __init__(self, max_bytes):
+        self.max_bytes = max_bytes
+        self._lines = deque()
+        self._bytes = 0
+        self._lock = threading.Lock()
+
+    def write(self, lines):
+        with self._lock:
+            for line in lines:
+                self._lines.append(line)
+                self._bytes += len(line) + 1
+            while self._bytes > self.max_bytes and self._lines:
+                self._bytes -= len(self._lines.popleft()) + 1
+
+    def lines(self, n=None):
+        """The last ``n`` lines held (default: all), oldest first"""
+        with self._lock:
+            held = list(self._lines)
+        return held if n is None else held[-n:] if n > 0 else []
+
+    def flush(self):
+        pass
+
+    def bytes_used(self):
+        return self._bytes
+
+    def close(self):
+        pass
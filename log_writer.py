@@ -0,0 +1,172 @@
+import atexit
+import os
+import queue
+import signal
+import threading
+import time
+
+
+class LogWriter:
+    """Background writer that group-commits log records off the request path.
+
+    Records are put on a bounded in-memory queue and a single flusher thread
+    hands them to the registered sinks in batches, either when ``batch_size``
+    records are waiting or ``flush_interval`` seconds have passed.  When the
+    queue is full the ``policy`` decides what happens: ``'drop'`` discards the
+    new record, ``'block'`` waits up to ``block_timeout`` seconds for space
+    before dropping it.
+    """
+
+    def __init__(self, max_queue=10000, batch_size=500, flush_interval=1.0,
+                 policy='drop', block_timeout=0.05):
+        self.max_queue = max_queue
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.policy = policy
+        self.block_timeout = block_timeout
+        self.sinks = {}
+        self.flush_hooks = []
+        self.tick_hooks = []
+        self._next_tick = 0.0
+        self.counters = {'enqueued': 0, 'written': 0, 'dropped': 0, 'batches': 0, 'errors': 0}
+        self._queue = None
+        self._thread = None
+        self._pid = None
+        self._start_lock = threading.Lock()
+        self._counter_lock = threading.Lock()
+
+    def register(self, name, sink):
+        """Register ``sink(records)`` to receive batches submitted under ``name``"""
+        self.sinks[name] = sink
+
+    def add_flush_hook(self, hook):
+        """Call ``hook()`` on the writer thread whenever flush() drains the queue"""
+        self.flush_hooks.append(hook)
+
+    def add_tick_hook(self, hook):
+        """Call ``hook()`` on the writer thread about every ``flush_interval``, busy or idle"""
+        self.tick_hooks.append(hook)
+
+    def _count(self, outcome, n=1):
+        # Request threads count here too, and += on a dict entry can lose updates
+        with self._counter_lock:
+            self.counters[outcome] += n
+
+    def start(self):
+        """Start this process's writer thread now rather than on the first submit"""
+        self._ensure_started()
+
+    def _ensure_started(self):
+        # Started lazily and per process so a gunicorn --preload fork gets its own thread
+        if self._pid == os.getpid():
+            return
+        with self._start_lock:
+            if self._pid == os.getpid():
+                return
+            self._queue = queue.Queue(self.max_queue)
+            self._thread = threading.Thread(target=self._run, name='log-writer', daemon=True)
+            self._pid = os.getpid()
+            self._thread.start()
+
+    def submit(self, name, record):
+        """Queue a record for sink ``name``; returns False if it was dropped"""
+        self._ensure_started()
+        try:
+            if self.policy == 'block':
+                self._queue.put((name, record), timeout=self.block_timeout)
+            else:
+                self._queue.put_nowait((name, record))
+        except queue.Full:
+            self._count('dropped')
+            return False
+        self._count('enqueued')
+        return True
+
+    def depth(self):
+        """Number of records waiting to be written"""
+        return self._queue.qsize() if self._queue is not None else 0
+
+    def flush(self, timeout=5.0):
+        """Block until everything queued so far has been written"""
+        if self._pid != os.getpid() or not self._thread.is_alive():
+            return False
+        done = threading.Event()
+        try:
+            self._queue.put(('__flush__', done), timeout=timeout)
+        except queue.Full:
+            return False
+        return done.wait(timeout)
+
+    def _run(self):
+        while True:
+            try:
+                batch = [self._queue.get(timeout=self.flush_interval)]
+            except queue.Empty:
+                self._tick()
+                continue
+            deadline = time.monotonic() + self.flush_interval
+            while len(batch) < self.batch_size:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0 or batch[-1][0] == '__flush__':
+                    break
+                try:
+                    batch.append(self._queue.get(timeout=remaining))
+                except queue.Empty:
+                    break
+            self._commit(batch)
+            self._tick()
+
+    def _tick(self):
+        now = time.monotonic()
+        if now < self._next_tick:
+            return
+        self._next_tick = now + self.flush_interval
+        for hook in self.tick_hooks:
+            try:
+                hook()
+            except Exception as e:
+                self._count('errors')
+                print(f"Error in log writer tick: {e}")
+
+    def _commit(self, batch):
+        grouped = {}
+        waiters = []
+        for name, record in batch:
+            if name == '__flush__':
+                waiters.append(record)
+            else:
+                grouped.setdefault(name, []).append(record)
+        for name, records in grouped.items():
+            try:
+                self.sinks[name](records)
+                self._count('written', len(records))
+            except Exception as e:
+                self._count('errors')
+                print(f"Error writing {name} log batch: {e}")
+        self._count('batches')
+        if waiters:
+            for hook in self.flush_hooks:
+                try:
+                    hook()
+                except Exception as e:
+                    self._count('errors')
+                    print(f"Error flushing log sinks: {e}")
+        for done in waiters:
+            done.set()
+
+    def install_shutdown_handlers(self):
+        """Flush on interpreter exit and on SIGTERM (Cloud Run scale-down)"""
+        atexit.register(self.flush)
+        if threading.current_thread() is not threading.main_thread():
+            return
+        previous = signal.getsignal(signal.SIGTERM)
+
+        def handle_sigterm(signum, frame):
+            self.flush()
+            if callable(previous):
+                previous(signum, frame)
+            elif previous == signal.SIG_DFL:
+                signal.signal(signal.SIGTERM, signal.SIG_DFL)
+                os.kill(os.getpid(), signal.SIGTERM)
+
+        signal.signal(signal.SIGTERM, handle_sigterm)
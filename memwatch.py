@@ -0,0 +1,190 @@
+"""Memory budget watchdog with stepwise degradation.
+
+On Cloud Run the heaps of all worker processes and the files under ``log/``
+share the container's memory limit, and crossing it means an OOM kill and a
+cold start.  ``MemoryWatchdog`` periodically reads the container's usage from
+the cgroup (``memory.current``, which already includes the in-memory
+filesystem), or where that is unavailable adds up the RSS of every worker of
+this server and the bytes held by log files, and compares it to the budget.  Crossing a threshold
+raises the degradation level straight away; the level comes back down one
+step at a time once usage is ``hysteresis`` below the lower threshold.
+"""
+import json
+import os
+import threading
+import time
+import tracemalloc
+from collections import deque
+
+LEVELS = ['normal', 'reduced_sampling', 'counts_only', 'shedding']
+PAGE_SIZE = os.sysconf('SC_PAGE_SIZE') if hasattr(os, 'sysconf') else 4096
+CGROUP_MEMORY_CURRENT = '/sys/fs/cgroup/memory.current'
+
+
+def cgroup_memory_bytes(path=CGROUP_MEMORY_CURRENT):
+    """Memory charged to this container's cgroup (v2), or None outside one"""
+    try:
+        with open(path, 'r') as f:
+            return int(f.read())
+    except (OSError, ValueError):
+        return None
+
+
+def rss_bytes(pid='self'):
+    """Resident set size of a process from /proc/<pid>/statm, or 0 off Linux"""
+    try:
+        with open(f'/proc/{pid}/statm', 'r') as f:
+            return int(f.read().split()[1]) * PAGE_SIZE
+    except (OSError, ValueError, IndexError):
+        return 0
+
+
+def child_pids(parent):
+    """Pids of the direct children of ``parent``, from /proc/<pid>/stat"""
+    children = []
+    for entry in os.listdir('/proc'):
+        if not entry.isdigit():
+            continue
+        try:
+            with open(f'/proc/{entry}/stat', 'r') as f:
+                # The command name is in parentheses and may contain spaces
+                ppid = int(f.read().rsplit(')', 1)[1].split()[1])
+        except (OSError, ValueError, IndexError):
+            continue
+        if ppid == parent:
+            children.append(int(entry))
+    return children
+
+
+def server_rss_bytes():
+    """RSS of the whole server: a gunicorn-style master running the same
+    executable as this process plus all its workers, or just this process"""
+    parent = os.getppid()
+    try:
+        forked = parent > 1 and os.readlink(f'/proc/{parent}/exe') == os.readlink('/proc/self/exe')
+    except OSError:
+        forked = False
+    if not forked:
+        return rss_bytes()
+    return rss_bytes(parent) + sum(rss_bytes(pid) for pid in child_pids(parent))
+
+
+def directory_bytes(path):
+    """Total size of the regular files directly in ``path``"""
+    total = 0
+    try:
+        with os.scandir(path) as entries:
+            for entry in entries:
+                if entry.is_file(follow_symlinks=False):
+                    total += entry.stat(follow_symlinks=False).st_size
+    except OSError:
+        pass
+    return total
+
+
+def parse_thresholds(spec, default=(0.70, 0.80, 0.90)):
+    """``"0.7,0.8,0.9"`` -> budget fractions at which each degradation level starts"""
+    if not spec:
+        return list(default)
+    thresholds = sorted(float(part) for part in spec.split(',') if part.strip())
+    return thresholds[:len(LEVELS) - 1]
+
+
+class MemoryWatchdog:
+    """Thread that sets the degradation level from container memory usage.
+
+    ``log_bytes()`` is only consulted when there is no cgroup to read, as
+    the cgroup figure already includes files on the in-memory filesystem.
+
+    ``on_level(level)`` is called on the watchdog thread at every transition.
+    With ``tracemalloc_top`` > 0 allocations are traced and the top
+    allocators are snapshotted whenever the level goes up.
+    """
+
+    def __init__(self, budget_bytes, thresholds, log_bytes, on_level, interval=5.0,
+                 hysteresis=0.05, tracemalloc_top=0, history=50):
+        self.budget_bytes = budget_bytes
+        self.thresholds = thresholds
+        self.log_bytes = log_bytes
+        self.on_level = on_level
+        self.interval = interval
+        self.hysteresis = hysteresis
+        self.tracemalloc_top = tracemalloc_top
+        self.level = 0
+        self.usage = {'rss': 0, 'logs': 0}
+        self.transitions = deque(maxlen=history)
+        self.transition_counts = [0] * len(LEVELS)
+        self.top_allocators = []
+        self._thread = None
+        self._pid = None
+        self._lock = threading.Lock()
+
+    def start(self):
+        """Start watching in this process; a no-op if already running here"""
+        with self._lock:
+            if self._pid == os.getpid():
+                return
+            if self.tracemalloc_top > 0 and not tracemalloc.is_tracing():
+                tracemalloc.start()
+            self._thread = threading.Thread(target=self._run, name='memory-watchdog', daemon=True)
+            self._pid = os.getpid()
+            self._thread.start()
+
+    def _run(self):
+        while True:
+            try:
+                self.check()
+            except Exception as e:
+                print(f"Error in memory watchdog: {e}")
+            time.sleep(self.interval)
+
+    def target_level(self, used):
+        """Level for ``used`` bytes given the current level and hysteresis"""
+        fraction = used / self.budget_bytes
+        level = sum(1 for threshold in self.thresholds if fraction >= threshold)
+        if level >= self.level:
+            return level
+        # Come down one step only once clearly below the current level's threshold
+        if fraction < self.thresholds[self.level - 1] - self.hysteresis:
+            return self.level - 1
+        return self.level
+
+    def check(self):
+        """Measure once and change level if needed; returns the level"""
+        self.usage = self.measure()
+        used = sum(self.usage.values())
+        level = self.target_level(used)
+        if level != self.level:
+            if level > self.level and tracemalloc.is_tracing():
+                self.top_allocators = self.snapshot_top()
+            transition = {'time': time.strftime('%Y-%m-%dT%H:%M:%S'), 'from': LEVELS[self.level],
+                          'to': LEVELS[level], 'used_bytes': used, **{f'{k}_bytes': v for k, v in self.usage.items()}}
+            self.transitions.append(transition)
+            self.transition_counts[level] += 1
+            self.level = level
+            print(json.dumps({'log': 'memory', 'pid': os.getpid(), **transition}), flush=True)
+            self.on_level(level)
+        return self.level
+
+    def measure(self):
+        """Bytes counted against the budget, by kind"""
+        container = cgroup_memory_bytes()
+        if container is not None:
+            return {'container': container}
+        return {'rss': server_rss_bytes(), 'logs': self.log_bytes()}
+
+    def snapshot_top(self):
+        snapshot = tracemalloc.take_snapshot().filter_traces([tracemalloc.Filter(False, tracemalloc.__file__)])
+        stats = snapshot.statistics('lineno')[:self.tracemalloc_top]
+        return [{'where': str(stat.traceback[0]), 'bytes': stat.size, 'blocks': stat.count} for stat in stats]
+
+    def status(self):
+        return {
+            'pid': os.getpid(),
+            'level': LEVELS[self.level],
+            'budget_bytes': self.budget_bytes,
+            'thresholds': self.thresholds,
+            'usage_bytes': dict(self.usage),
+            'transitions': list(self.transitions),
+            'top_allocators': self.top_allocators,
+        }
@@ -0,0 +1,189 @@
+"""Merge per-worker log shards into single time-ordered logs.
+
+Each gunicorn worker writes ``log/usage-<pid>.log`` and ``log/techx-<pid>.json``
+(whose older records are rotated into ``techx-<pid>.json.<n>.gz``), or with
+``TECHNICAL_LOG_FORMAT=columnar`` ``log/techx-<pid>.cols`` (and ``.cols.<n>``).
+This tool merges them (together with any existing ``usage.log``/``techx.json``) into one
+time-ordered view, keeping only the last ``MAX_USAGE_ENTRIES`` usage entries
+across all workers and the newest ``TECHNICAL_LOG_MAX_BYTES`` of technical
+records in the compacted ``techx.json``.
+
+    python merge_logs.py                 # print the merged usage log
+    python merge_logs.py --kind technical --output merged.json
+    python merge_logs.py --compact       # fold finished shards into usage.log/techx.json/birthstats.json
+"""
+import argparse
+import glob
+import gzip
+import heapq
+import json
+import os
+import re
+import sys
+from collections import deque
+
+import columnar_log
+from birthstats import BirthdateHistogram, load_histogram, save_histogram
+from usage_log import (build_index, entry_timestamp, find_shards, iter_entries, pid_alive, remove_segment,
+                       segment_paths)
+
+LOG_DIR = 'log'
+MAX_USAGE_ENTRIES = 100000
+TECHNICAL_LOG_MAX_BYTES = int(os.environ.get('TECHNICAL_LOG_MAX_BYTES', 64 * 1024 * 1024))
+
+
+def technical_segments(path):
+    """Rotated segments oldest first, then ``path`` itself if present.
+
+    NDJSON shards rotate into ``path.<n>.gz``, columnar ones into ``path.<n>``.
+    """
+    suffix = '' if path.endswith('.cols') else '.gz'
+    numbered = []
+    for candidate in glob.glob(f"{glob.escape(path)}.*{suffix}"):
+        number = candidate[len(path) + 1:len(candidate) - len(suffix)]
+        if number.isdigit():
+            numbered.append((int(number), candidate))
+    paths = [p for _, p in sorted(numbered)]
+    if os.path.exists(path):
+        paths.append(path)
+    return paths
+
+
+def find_technical_shards(path):
+    """Map shard id to shard path for every shard of ``path`` with a file or segment on disk"""
+    root, ext = os.path.splitext(path)
+    pattern = re.compile(re.escape(root) + r'-(\w+)' + re.escape(ext) + r'(\.\d+(\.gz)?)?$')
+    shards = {}
+    for candidate in glob.glob(f"{glob.escape(root)}-*{ext}*"):
+        match = pattern.match(candidate)
+        if match:
+            shards[match.group(1)] = f"{root}-{match.group(1)}{ext}"
+    return shards
+
+
+def iter_records(path):
+    """Yield the records of ``path`` and its rotated segments as NDJSON lines, oldest first"""
+    for segment in technical_segments(path):
+        if path.endswith('.cols'):
+            for record in columnar_log.iter_records(segment):
+                yield json.dumps(record, separators=(',', ':'), ensure_ascii=False)
+            continue
+        opener = gzip.open if segment.endswith('.gz') else open
+        with opener(segment, 'rt', encoding='utf-8') as f:
+            for line in f:
+                line = line.rstrip('\n')
+                if line:
+                    yield line
+
+
+def technical_timestamp(line):
+    try:
+        return json.loads(line).get('timestamp') or ''
+    except ValueError:
+        return ''
+
+
+def merge_usage(base, shard_paths, max_entries):
+    """Last ``max_entries`` usage entries across ``base`` and all shards, in time order"""
+    sources = [iter_entries(base)] + [iter_entries(p) for p in shard_paths]
+    return deque(heapq.merge(*sources, key=entry_timestamp), maxlen=max_entries)
+
+
+def merge_technical(base, shard_paths):
+    """Stream technical records of ``base`` and all shards in time order"""
+    sources = [iter_records(base)] + [iter_records(p) for p in shard_paths]
+    return heapq.merge(*sources, key=technical_timestamp)
+
+
+def newest_within(lines, max_bytes):
+    """The last of ``lines`` whose total size, newlines included, fits in ``max_bytes``"""
+    kept = deque()
+    total = 0
+    for line in lines:
+        kept.append(line)
+        total += len(line.encode('utf-8')) + 1
+        while total > max_bytes:
+            total -= len(kept.popleft().encode('utf-8')) + 1
+    return kept
+
+
+def write_lines(lines, output):
+    if output is None:
+        for line in lines:
+            sys.stdout.write(line + '\n')
+        return
+    tmp = output + '.tmp'
+    with open(tmp, 'w', encoding='utf-8') as f:
+        for line in lines:
+            f.write(line + '\n')
+    os.replace(tmp, output)
+
+
+def compact(log_dir, max_entries, max_technical_bytes=TECHNICAL_LOG_MAX_BYTES):
+    """Fold shards of finished processes into the base logs and delete them"""
+    usage_base = os.path.join(log_dir, 'usage.log')
+    technical_base = os.path.join(log_dir, 'techx.json')
+
+    usage_done = [p for sid, p in find_shards(usage_base).items() if not pid_alive(sid)]
+    entries = merge_usage(usage_base, usage_done, max_entries)
+    stale = [p for p in segment_paths(usage_base) if p != usage_base]
+    write_lines(entries, usage_base)
+    build_index(usage_base)
+    for path in stale:
+        remove_segment(path)
+    for shard in usage_done:
+        for path in segment_paths(shard):
+            remove_segment(path)
+
+    technical_done = [p for base in (technical_base, os.path.join(log_dir, 'techx.cols'))
+                      for sid, p in find_technical_shards(base).items() if not pid_alive(sid)]
+    if technical_done:
+        records = newest_within(merge_technical(technical_base, technical_done), max_technical_bytes)
+        write_lines(records, technical_base)
+        for shard in technical_done:
+            for path in technical_segments(shard):
+                os.remove(path)
+    stats_base = os.path.join(log_dir, 'birthstats.json')
+    stats_done = [p for sid, p in find_shards(stats_base).items() if not pid_alive(sid)]
+    if stats_done:
+        histogram = load_histogram(stats_base) if os.path.exists(stats_base) else BirthdateHistogram()
+        for path in stats_done:
+            histogram.merge(load_histogram(path))
+        save_histogram(histogram, stats_base)
+        for path in stats_done:
+            os.remove(path)
+    return len(entries), len(usage_done), len(technical_done)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split('\n', 1)[0])
+    parser.add_argument('--log-dir', default=LOG_DIR)
+    parser.add_argument('--kind', choices=['usage', 'technical'], default='usage')
+    parser.add_argument('--output', help='write the merged view here instead of stdout')
+    parser.add_argument('--max-entries', type=int, default=MAX_USAGE_ENTRIES)
+    parser.add_argument('--max-technical-bytes', type=int, default=TECHNICAL_LOG_MAX_BYTES,
+                        help='byte budget of the compacted techx.json; the oldest records are dropped')
+    parser.add_argument('--compact', action='store_true',
+                        help='merge shards of exited workers into the base logs and remove them')
+    args = parser.parse_args(argv)
+
+    if args.compact:
+        kept, usage_shards, technical_shards = compact(args.log_dir, args.max_entries, args.max_technical_bytes)
+        print(f"Compacted {usage_shards} usage and {technical_shards} technical shards; "
+              f"{kept} usage entries retained", file=sys.stderr)
+        return 0
+
+    if args.kind == 'usage':
+        base = os.path.join(args.log_dir, 'usage.log')
+        lines = merge_usage(base, find_shards(base).values(), args.max_entries)
+    else:
+        base = os.path.join(args.log_dir, 'techx.json')
+        shards = list(find_technical_shards(base).values())
+        shards += find_technical_shards(os.path.join(args.log_dir, 'techx.cols')).values()
+        lines = merge_technical(base, shards)
+    write_lines(lines, args.output)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,162 @@
+"""On-demand profiling of live requests.
+
+Two independent tools, both aggregated in memory until dumped:
+
+* ``SampledProfiler`` runs a configurable fraction of calls of a wrapped
+  function (the ``/`` view) under cProfile and merges the results into one
+  pstats table.  Only one call is profiled at a time; sampled calls that
+  overlap it run unprofiled.  When the fraction is 0 a call costs one
+  comparison.
+* ``StackSampler`` is a thread that snapshots every other thread's stack
+  with ``sys._current_frames()`` at a fixed interval and counts identical
+  stacks, giving the collapsed-stack format flamegraph tools read.
+"""
+import cProfile
+import functools
+import io
+import marshal
+import os
+import pstats
+import random
+import sys
+import threading
+import time
+from collections import Counter
+
+
+class SampledProfiler:
+    """cProfile a random ``fraction`` of calls to functions wrapped with ``wrap()``"""
+
+    def __init__(self, fraction=0.0):
+        self.fraction = fraction
+        self.calls = 0
+        self._stats = None
+        self._lock = threading.Lock()
+        self._active = threading.Lock()
+
+    def wrap(self, fn):
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            if self.fraction <= 0 or random.random() >= self.fraction:
+                return fn(*args, **kwargs)
+            # One profiled call at a time: from Python 3.12 cProfile is
+            # process-wide, a second enable() raises and an active profile
+            # records every thread; concurrent sampled calls just run normally
+            if not self._active.acquire(blocking=False):
+                return fn(*args, **kwargs)
+            try:
+                profile = cProfile.Profile()
+                try:
+                    profile.enable()
+                except ValueError:  # another profiling tool is active
+                    return fn(*args, **kwargs)
+                try:
+                    return fn(*args, **kwargs)
+                finally:
+                    profile.disable()
+                    self._add(profile)
+            finally:
+                self._active.release()
+        return wrapper
+
+    def _add(self, profile):
+        with self._lock:
+            self.calls += 1
+            if self._stats is None:
+                self._stats = pstats.Stats(profile)
+            else:
+                self._stats.add(profile)
+
+    def reset(self):
+        with self._lock:
+            self.calls = 0
+            self._stats = None
+
+    def pstats_bytes(self):
+        """Aggregated stats in the file format of ``pstats.Stats.dump_stats()``"""
+        with self._lock:
+            return marshal.dumps(self._stats.stats if self._stats is not None else {})
+
+    def report(self, sort='cumulative', limit=40):
+        """The aggregated stats as text, as ``python -m pstats`` would print them"""
+        out = io.StringIO()
+        with self._lock:
+            if self._stats is None:
+                return 'no profiled calls\n'
+            self._stats.stream = out
+            self._stats.sort_stats(sort).print_stats(limit)
+        return out.getvalue()
+
+
+def frame_label(frame):
+    code = frame.f_code
+    return f"{os.path.basename(code.co_filename)}:{getattr(code, 'co_qualname', code.co_name)}"
+
+
+class StackSampler:
+    """Count the stacks of all other threads every ``interval`` seconds.
+
+    At most ``max_stacks`` distinct stacks are kept; samples of further new
+    stacks are counted under ``[other]`` so memory stays bounded.
+    """
+
+    def __init__(self, interval=0.01, max_stacks=10000):
+        self.interval = interval
+        self.max_stacks = max_stacks
+        self.samples = 0
+        self.stacks = Counter()
+        self._stop_at = None
+        self._thread = None
+        self._pid = None
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+
+    def running(self):
+        return self._pid == os.getpid() and self._thread is not None and self._thread.is_alive()
+
+    def start(self, duration=None):
+        """Start sampling in this process, for ``duration`` seconds or until stop()"""
+        with self._lock:
+            self._stop_at = time.monotonic() + duration if duration else None
+            if self.running():
+                return
+            self._stop = threading.Event()
+            self._thread = threading.Thread(target=self._run, name='stack-sampler', daemon=True)
+            self._pid = os.getpid()
+            self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self.running():
+            self._thread.join(timeout=1.0)
+
+    def reset(self):
+        with self._lock:
+            self.samples = 0
+            self.stacks = Counter()
+
+    def _run(self):
+        own = threading.get_ident()
+        while not self._stop.wait(self.interval):
+            if self._stop_at is not None and time.monotonic() >= self._stop_at:
+                break
+            frames = sys._current_frames()
+            with self._lock:
+                for ident, frame in frames.items():
+                    if ident == own:
+                        continue
+                    labels = []
+                    while frame is not None:
+                        labels.append(frame_label(frame))
+                        frame = frame.f_back
+                    stack = ';'.join(reversed(labels))
+                    if stack not in self.stacks and len(self.stacks) >= self.max_stacks:
+                        stack = '[other]'
+                    self.stacks[stack] += 1
+                self.samples += 1
+            del frames
+
+    def collapsed(self):
+        """``frame;frame;frame count`` lines, as read by flamegraph.pl and speedscope"""
+        with self._lock:
+            return ''.join(f"{stack} {count}\n" for stack, count in self.stacks.most_common())
@@ -0,0 +1,76 @@
+"""Cold-start timing for scale-to-zero deployments.
+
+With ``minScale 0`` the first request after an idle period waits for the
+container to boot, the interpreter to start, the app to import and warm up
+and the first response to be built.  ``StartupTimer`` records how long each
+of those took in this process so the numbers can be watched on ``/startup``
+and ``/metrics`` and compared between builds.
+"""
+import json
+import os
+import time
+from contextlib import contextmanager
+
+
+def process_age():
+    """Seconds since this process was started by the kernel, or None off Linux"""
+    try:
+        with open('/proc/self/stat', 'r') as f:
+            # Fields after the parenthesised command name; starttime is field 22 of the full line
+            fields = f.read().rsplit(')', 1)[1].split()
+        with open('/proc/uptime', 'r') as f:
+            uptime = float(f.read().split()[0])
+        return max(0.0, uptime - int(fields[19]) / os.sysconf('SC_CLK_TCK'))
+    except (OSError, ValueError, IndexError):
+        return None
+
+
+class StartupTimer:
+    """Phases of the app import, warmup and time to first response of this process"""
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        # Interpreter start and server boot before the app module began importing
+        self.before_import = process_age()
+        self.phases = {}
+        self.import_seconds = None
+        self.warmup_seconds = None
+        self.first_response_seconds = None
+        self.first_response_pid = None
+
+    @contextmanager
+    def phase(self, name):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.phases[name] = time.perf_counter() - start
+
+    def mark(self, name):
+        """Record the time since the timer was created as phase ``name``"""
+        self.phases[name] = time.perf_counter() - self.started
+
+    def imported(self):
+        """Mark the end of the module import"""
+        self.import_seconds = time.perf_counter() - self.started
+
+    def first_response(self):
+        """Record time to first response once per process and print the report; cheap afterwards"""
+        if self.first_response_pid == os.getpid():
+            return
+        self.first_response_pid = os.getpid()
+        self.first_response_seconds = time.perf_counter() - self.started
+        print(json.dumps({'log': 'startup', **self.report()}), flush=True)
+
+    def report(self):
+        def rounded(value):
+            return None if value is None else round(value, 4)
+
+        return {
+            'pid': os.getpid(),
+            'before_import_seconds': rounded(self.before_import),
+            'import_seconds': rounded(self.import_seconds),
+            'phases': {name: rounded(seconds) for name, seconds in self.phases.items()},
+            'warmup_seconds': rounded(self.warmup_seconds),
+            'first_response_seconds': rounded(self.first_response_seconds),
+        }
@@ -0,0 +1,253 @@
+// Detect mobile OS
+function isMobileOS() {
+    const ua = navigator.userAgent || navigator.vendor || window.opera;
+    if (/android/i.test(ua)) return true;
+    if (/iPad|iPhone|iPod/.test(ua) && !window.MSStream) return true;
+    return false;
+}
+
+// Current mode state
+let isDesktopMode = !isMobileOS();
+
+// Render date input based on mode
+function renderDateInput(isDesktop, value) {
+    const container = document.getElementById('dateInputContainer');
+    const toggleBtn = document.getElementById('modeToggle');
+
+    container.innerHTML = '';
+
+    if (isDesktop) {
+        // Desktop: keyboard date input
+        container.innerHTML = `<input type="date" id="dateInput" value="${value||''}" required>`;
+        toggleBtn.textContent = 'Switch to Mobile';
+        toggleBtn.style.display = 'block';
+    } else {
+        // Mobile: scroll wheel style
+        const today = new Date();
+        let y = today.getFullYear();
+        let selected = { year: '', month: '', day: '' };
+        if (value) {
+            let parts = value.split('-');
+            if (parts.length === 3) {
+                selected.year = parts[0];
+                selected.month = parts[1];
+                selected.day = parts[2];
+            }
+        }
+
+        let yearSel = '<select id="yearSel">';
+        for (let i = y; i >= y-125; i--) {
+            yearSel += `<option value="${i}"${selected.year==i?" selected":''}>${i}</option>`;
+        }
+        yearSel += '</select>';
+
+        let monthSel = '<select id="monthSel">';
+        for (let i = 1; i <= 12; i++) {
+            let m = i.toString().padStart(2,'0');
+            monthSel += `<option value="${m}"${selected.month==m?" selected":''}>${m}</option>`;
+        }
+        monthSel += '</select>';
+
+        let daySel = '<select id="daySel">';
+        for (let i = 1; i <= 31; i++) {
+            let d = i.toString().padStart(2,'0');
+            daySel += `<option value="${d}"${selected.day==d?" selected":''}>${d}</option>`;
+        }
+        daySel += '</select>';
+
+        container.innerHTML = `<div class="date-selects">${yearSel}${monthSel}${daySel}</div>`;
+        toggleBtn.textContent = 'Switch to Desktop';
+        toggleBtn.style.display = 'block';
+    }
+}
+
+// Sync selects to hidden input
+function syncMobileDate() {
+    const y = document.getElementById('yearSel').value;
+    const m = document.getElementById('monthSel').value;
+    const d = document.getElementById('daySel').value;
+    document.getElementById('birthdate').value = `${y}-${m}-${d}`;
+}
+
+// Sync date input to hidden input
+function syncDesktopDate() {
+    document.getElementById('birthdate').value = document.getElementById('dateInput').value;
+}
+
+// Initialize
+let value = document.getElementById('birthdate').value;
+
+function updateInput() {
+    renderDateInput(isDesktopMode, value);
+    if (isDesktopMode) {
+        syncDesktopDate();
+        if (document.getElementById('dateInput')) {
+            document.getElementById('dateInput').addEventListener('input', syncDesktopDate);
+        }
+    } else {
+        syncMobileDate();
+        if (document.getElementById('yearSel')) {
+            document.getElementById('yearSel').addEventListener('change', syncMobileDate);
+            document.getElementById('monthSel').addEventListener('change', syncMobileDate);
+            document.getElementById('daySel').addEventListener('change', syncMobileDate);
+        }
+    }
+}
+
+// Toggle button functionality
+document.getElementById('modeToggle').addEventListener('click', function() {
+    isDesktopMode = !isDesktopMode;
+    updateInput();
+});
+
+// Initialize
+updateInput();
+
+// On form submit, ensure hidden input is synced
+document.getElementById('birthForm').addEventListener('submit', function() {
+    if (isDesktopMode) {
+        syncDesktopDate();
+    } else {
+        syncMobileDate();
+    }
+});
+
+// Calculate detailed time alive
+function updateDetailedAge(element) {
+    const birthdate = new Date(element.dataset.birthdate);
+    const now = new Date();
+
+    // Calculate differences
+    let years = now.getFullYear() - birthdate.getFullYear();
+    let months = now.getMonth() - birthdate.getMonth();
+    let days = now.getDate() - birthdate.getDate();
+    let hours = now.getHours() - birthdate.getHours();
+    let minutes = now.getMinutes() - birthdate.getMinutes();
+    let seconds = now.getSeconds() - birthdate.getSeconds();
+
+    // Adjust for negative values
+    if (seconds < 0) {
+        seconds += 60;
+        minutes--;
+    }
+    if (minutes < 0) {
+        minutes += 60;
+        hours--;
+    }
+    if (hours < 0) {
+        hours += 24;
+        days--;
+    }
+    if (days < 0) {
+        const prevMonth = new Date(now.getFullYear(), now.getMonth(), 0);
+        days += prevMonth.getDate();
+        months--;
+    }
+    if (months < 0) {
+        months += 12;
+        years--;
+    }
+
+    document.getElementById('timeAlive').innerHTML =
+        `${years} years, ${months} months, ${days} days, ${hours} hours, ${minutes} minutes, ${seconds} seconds`;
+}
+
+// Update every second when an age result is shown
+let detailedAgeTimer = null;
+
+function startDetailedAge(element) {
+    clearInterval(detailedAgeTimer);
+    updateDetailedAge(element);
+    detailedAgeTimer = setInterval(() => updateDetailedAge(element), 1000);
+}
+
+const detailedAge = document.getElementById('detailedAge');
+if (detailedAge) {
+    startDetailedAge(detailedAge);
+}
+
+// Client compute mode: the page is static, the age is worked out here and
+// the server only gets a beacon with the birthdate for the usage log
+const MAX_AGE = 125;
+
+// Same rules as agecalc.py; a Feb 29 birthday falls on Mar 1 in common years
+function computeAge(birthdate) {
+    const match = /^(\d{4})-(\d{2})-(\d{2})$/.exec(birthdate);
+    if (!match) return null;
+    const [year, month, day] = match.slice(1).map(Number);
+    const born = new Date(Date.UTC(year, month - 1, day));
+    if (born.getUTCMonth() !== month - 1 || born.getUTCDate() !== day) return null;
+
+    const now = new Date();
+    const today = Date.UTC(now.getFullYear(), now.getMonth(), now.getDate());
+    const beforeBirthday = now.getMonth() + 1 < month || (now.getMonth() + 1 === month && now.getDate() < day);
+    const age = now.getFullYear() - year - (beforeBirthday ? 1 : 0);
+
+    let daysUntil = null;
+    for (const y of [now.getFullYear(), now.getFullYear() + 1]) {
+        let birthday = new Date(Date.UTC(y, month - 1, day));
+        if (birthday.getUTCMonth() !== month - 1) birthday = new Date(Date.UTC(y, 2, 1));
+        if (birthday.getTime() >= today) {
+            daysUntil = Math.round((birthday.getTime() - today) / 86400000);
+            break;
+        }
+    }
+    return { age, daysUntil, overMaxAge: age > MAX_AGE };
+}
+
+function sendBeacon(birthdate) {
+    const body = new URLSearchParams({ birthdate });
+    if (!(navigator.sendBeacon && navigator.sendBeacon('/beacon', body))) {
+        fetch('/beacon', { method: 'POST', body, keepalive: true }).catch(() => {});
+    }
+}
+
+function showResult(birthdate, result) {
+    const container = document.querySelector('.container');
+    const old = container.querySelector('.result');
+    if (old) old.remove();
+    clearInterval(detailedAgeTimer);
+    if (!result) return;
+
+    const div = document.createElement('div');
+    div.className = 'result';
+    if (result.overMaxAge) {
+        const jokes = JSON.parse(document.getElementById('jokes').textContent);
+        const joke = document.createElement('div');
+        joke.className = 'joke';
+        joke.textContent = jokes[Math.floor(Math.random() * jokes.length)];
+        div.appendChild(joke);
+    } else {
+        const strong = document.createElement('strong');
+        strong.textContent = result.age;
+        div.append('You are ', strong, ' years old.');
+        const next = document.createElement('div');
+        next.className = 'next-birthday';
+        if (result.daysUntil === 0) {
+            next.textContent = 'Happy birthday! 🎂';
+        } else {
+            const days = document.createElement('strong');
+            days.textContent = result.daysUntil;
+            next.append('Your next birthday is in ', days, ` day${result.daysUntil === 1 ? '' : 's'}.`);
+        }
+        div.appendChild(next);
+        const detailed = document.createElement('div');
+        detailed.id = 'detailedAge';
+        detailed.dataset.birthdate = birthdate;
+        detailed.innerHTML = '<span id="timeAlive"></span>';
+        div.appendChild(detailed);
+    }
+    container.appendChild(div);
+    const detailedElement = document.getElementById('detailedAge');
+    if (detailedElement) startDetailedAge(detailedElement);
+}
+
+const birthForm = document.getElementById('birthForm');
+if (birthForm.dataset.compute === 'client') {
+    birthForm.addEventListener('submit', function(event) {
+        event.preventDefault();
+        const birthdate = document.getElementById('birthdate').value;
+        sendBeacon(birthdate);
+        showResult(birthdate, computeAge(birthdate));
+    });
+}
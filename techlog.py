@@ -0,0 +1,127 @@
+"""Schema-driven capture of technical request information.
+
+``CAPTURE_SCHEMA`` lists every field the technical log knows about and
+whether it is kept.  ``TechnicalCapture`` compiles the kept fields once into
+flat lookup tables, samples requests per HTTP method and produces flat
+records with unset fields left out.
+"""
+import random
+from collections import namedtuple
+from datetime import datetime
+
+# source: 'attr' (request attribute), 'environ' (WSGI environ key),
+# 'header' (request header) or 'computed' (see COMPUTED below)
+Field = namedtuple('Field', 'name source key include')
+
+CAPTURE_SCHEMA = [
+    Field('method', 'environ', 'REQUEST_METHOD', True),
+    Field('path', 'environ', 'PATH_INFO', True),
+    Field('query_string', 'environ', 'QUERY_STRING', True),
+    Field('url', 'attr', 'url', False),
+    Field('base_url', 'attr', 'base_url', False),
+    Field('scheme', 'environ', 'wsgi.url_scheme', True),
+    Field('remote_addr', 'environ', 'REMOTE_ADDR', True),
+    Field('remote_user', 'environ', 'REMOTE_USER', False),
+    Field('REMOTE_HOST', 'environ', 'REMOTE_HOST', False),
+    Field('REQUEST_URI', 'environ', 'REQUEST_URI', False),
+    Field('SERVER_NAME', 'environ', 'SERVER_NAME', False),
+    Field('SERVER_PORT', 'environ', 'SERVER_PORT', False),
+    Field('SERVER_PROTOCOL', 'environ', 'SERVER_PROTOCOL', True),
+    Field('SERVER_SOFTWARE', 'environ', 'SERVER_SOFTWARE', False),
+    Field('GATEWAY_INTERFACE', 'environ', 'GATEWAY_INTERFACE', False),
+    Field('CONTENT_TYPE', 'environ', 'CONTENT_TYPE', False),
+    Field('CONTENT_LENGTH', 'environ', 'CONTENT_LENGTH', False),
+    Field('User-Agent', 'header', 'User-Agent', True),
+    Field('Accept', 'header', 'Accept', False),
+    Field('Accept-Language', 'header', 'Accept-Language', True),
+    Field('Accept-Encoding', 'header', 'Accept-Encoding', False),
+    Field('Referer', 'header', 'Referer', True),
+    Field('Origin', 'header', 'Origin', False),
+    Field('Host', 'header', 'Host', True),
+    Field('Connection', 'header', 'Connection', False),
+    Field('Upgrade-Insecure-Requests', 'header', 'Upgrade-Insecure-Requests', False),
+    Field('Sec-Fetch-Dest', 'header', 'Sec-Fetch-Dest', False),
+    Field('Sec-Fetch-Mode', 'header', 'Sec-Fetch-Mode', False),
+    Field('Sec-Fetch-Site', 'header', 'Sec-Fetch-Site', False),
+    Field('Sec-Fetch-User', 'header', 'Sec-Fetch-User', False),
+    Field('Sec-Ch-Ua', 'header', 'Sec-Ch-Ua', True),
+    Field('Sec-Ch-Ua-Mobile', 'header', 'Sec-Ch-Ua-Mobile', True),
+    Field('Sec-Ch-Ua-Platform', 'header', 'Sec-Ch-Ua-Platform', True),
+    Field('Cache-Control', 'header', 'Cache-Control', False),
+    Field('Pragma', 'header', 'Pragma', False),
+    Field('DNT', 'header', 'DNT', False),
+    Field('X-Forwarded-For', 'header', 'X-Forwarded-For', True),
+    Field('X-Real-IP', 'header', 'X-Real-IP', False),
+    Field('X-Forwarded-Proto', 'header', 'X-Forwarded-Proto', False),
+    Field('form_data', 'computed', 'form', True),
+    Field('args', 'computed', 'args', False),
+    Field('files', 'computed', 'files', False),
+    Field('cookies', 'computed', 'cookies', False),
+    Field('is_json', 'attr', 'is_json', False),
+    Field('is_secure', 'attr', 'is_secure', False),
+    Field('access_route', 'computed', 'access_route', False),
+]
+
+COMPUTED = {
+    'form': lambda r: dict(r.form) if r.method == 'POST' and r.form else None,
+    'args': lambda r: dict(r.args) if r.args else None,
+    'files': lambda r: list(r.files.keys()) if r.method == 'POST' and r.files else None,
+    'cookies': lambda r: dict(r.cookies) if r.cookies else None,
+    'access_route': lambda r: list(r.access_route) or None,
+}
+
+
+def header_environ_key(header):
+    """WSGI environ key a request header arrives under"""
+    return 'HTTP_' + header.upper().replace('-', '_')
+
+
+def parse_sample_rates(spec):
+    """Parse ``'POST=1,GET=0.01'`` into ``{'POST': 1.0, 'GET': 0.01}``"""
+    rates = {}
+    for part in (spec or '').split(','):
+        if '=' in part:
+            method, rate = part.split('=', 1)
+            rates[method.strip().upper()] = min(1.0, max(0.0, float(rate)))
+    return rates
+
+
+class TechnicalCapture:
+    """Compiled extractor for the included fields of a capture schema"""
+
+    def __init__(self, schema=CAPTURE_SCHEMA, fields=None, sample_rates=None, default_rate=1.0):
+        wanted = set(fields) if fields else {f.name for f in schema if f.include}
+        kept = [f for f in schema if f.name in wanted]
+        # Headers are read straight from the environ: one dict lookup per field
+        self.environ_fields = tuple(
+            (f.name, header_environ_key(f.key) if f.source == 'header' else f.key)
+            for f in kept if f.source in ('environ', 'header'))
+        self.attr_fields = tuple((f.name, f.key) for f in kept if f.source == 'attr')
+        self.computed_fields = tuple((f.name, COMPUTED[f.key]) for f in kept if f.source == 'computed')
+        self.sample_rates = sample_rates or {}
+        self.default_rate = default_rate
+        # Multiplier on every sample rate, lowered under memory pressure
+        self.rate_scale = 1.0
+
+    def capture(self, request_obj):
+        """Flat record for a sampled request, or None if it is not sampled"""
+        rate = self.sample_rates.get(request_obj.method, self.default_rate) * self.rate_scale
+        if rate < 1.0 and random.random() >= rate:
+            return None
+        record = {'timestamp': datetime.now().isoformat()}
+        if rate < 1.0:
+            record['sample_rate'] = rate
+        environ = request_obj.environ
+        for name, key in self.environ_fields:
+            value = environ.get(key)
+            if value:
+                record[name] = value
+        for name, attr in self.attr_fields:
+            value = getattr(request_obj, attr)
+            if value is not None:
+                record[name] = value
+        for name, compute in self.computed_fields:
+            value = compute(request_obj)
+            if value is not None:
+                record[name] = value
+        return record
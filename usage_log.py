@@ -0,0 +1,305 @@
+import glob
+import heapq
+import os
+import re
+import threading
+from bisect import bisect_left
+from collections import deque
+from itertools import chain
+
+# Entries per block of the sparse time index kept next to each segment
+INDEX_BLOCK = 256
+
+
+def pid_alive(shard_id):
+    """True if the shard belongs to a process that is still running"""
+    if not shard_id.isdigit():
+        return False
+    try:
+        os.kill(int(shard_id), 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+def shard_path(path, shard_id=None):
+    """Per-process variant of ``path``: ``log/usage.log`` -> ``log/usage-<pid>.log``"""
+    root, ext = os.path.splitext(path)
+    return f"{root}-{os.getpid() if shard_id is None else shard_id}{ext}"
+
+
+def find_shards(path):
+    """Map shard id to shard path for every shard of ``path`` on disk"""
+    root, ext = os.path.splitext(path)
+    pattern = re.compile(re.escape(root) + r'-(\w+)' + re.escape(ext) + '$')
+    shards = {}
+    for candidate in glob.glob(f"{glob.escape(root)}-*{ext}"):
+        match = pattern.match(candidate)
+        if match:
+            shards[match.group(1)] = candidate
+    return shards
+
+
+def segment_paths(path):
+    """Rotated segments of ``path`` followed by ``path`` itself, oldest first"""
+    numbered = []
+    for candidate in glob.glob(f"{glob.escape(path)}.*"):
+        suffix = candidate[len(path) + 1:]
+        if suffix.isdigit():
+            numbered.append((int(suffix), candidate))
+    paths = [p for _, p in sorted(numbered, reverse=True)]
+    if os.path.exists(path):
+        paths.append(path)
+    return paths
+
+
+def iter_entries(path):
+    """Yield every entry of a segmented log, oldest first"""
+    for segment in segment_paths(path):
+        with open(segment, 'r', encoding='utf-8') as f:
+            for line in f:
+                yield line.rstrip('\n')
+
+
+def entry_timestamp(line):
+    """Timestamp of a ``timestamp | birthdate`` entry"""
+    return line.split(' | ', 1)[0]
+
+
+def index_path(segment):
+    """Sidecar holding one ``timestamp offset`` line per block of ``segment``"""
+    return segment + '.idx'
+
+
+def remove_segment(segment):
+    """Delete a segment and its index"""
+    for path in (segment, index_path(segment)):
+        if os.path.exists(path):
+            os.remove(path)
+
+
+def scan_index(segment, block=INDEX_BLOCK):
+    """Index of ``segment`` built in memory by scanning it; returns (timestamps, offsets)"""
+    timestamps, offsets = [], []
+    offset = 0
+    with open(segment, 'rb') as f:
+        for n, raw in enumerate(f):
+            if n % block == 0:
+                timestamps.append(entry_timestamp(raw.decode('utf-8', 'replace')))
+                offsets.append(offset)
+            offset += len(raw)
+    return timestamps, offsets
+
+
+def build_index(segment, block=INDEX_BLOCK):
+    """Scan ``segment`` and write its index; returns (timestamps, offsets).
+
+    Only the segment's writer may do this: a live ``UsageLog`` keeps its
+    index open for appends, and replacing the file under it would orphan
+    every later entry.
+    """
+    timestamps, offsets = scan_index(segment, block)
+    tmp = index_path(segment) + '.tmp'
+    with open(tmp, 'w', encoding='utf-8') as f:
+        f.writelines(f"{ts} {off}\n" for ts, off in zip(timestamps, offsets))
+    os.replace(tmp, index_path(segment))
+    return timestamps, offsets
+
+
+def index_matches(segment, timestamps, offsets):
+    """Cheap staleness check: the last indexed entry is still where the index says"""
+    size = os.path.getsize(segment)
+    if not offsets:
+        return size == 0
+    if offsets[-1] >= size:
+        return False
+    # The entry must start at the offset: right after a newline, or at byte 0
+    expected = timestamps[-1].encode('utf-8') + b' | '
+    if offsets[-1] > 0:
+        expected = b'\n' + expected
+    with open(segment, 'rb') as f:
+        f.seek(offsets[-1] - (1 if offsets[-1] > 0 else 0))
+        head = f.read(len(expected))
+    return head == expected
+
+
+def stored_index(segment):
+    """The ``.idx`` of ``segment`` as (timestamps, offsets) if it exists and is current, else None"""
+    try:
+        with open(index_path(segment), 'r', encoding='utf-8') as f:
+            pairs = [line.split(' ') for line in f if line.endswith('\n')]
+        timestamps = [ts for ts, _ in pairs]
+        offsets = [int(off) for _, off in pairs]
+        if index_matches(segment, timestamps, offsets):
+            return timestamps, offsets
+    except (OSError, ValueError):
+        pass
+    return None
+
+
+def load_index(segment, block=INDEX_BLOCK, write=False):
+    """The index of ``segment`` as (timestamps, offsets), rebuilt if missing or stale.
+
+    A rebuilt index is only written back with ``write=True``, which the
+    segment's owner passes; readers keep theirs in memory.
+    """
+    stored = stored_index(segment)
+    if stored is not None:
+        return stored
+    return build_index(segment, block) if write else scan_index(segment, block)
+
+
+def iter_range(segment, start=None, end=None):
+    """Entries of one segment with ``start <= timestamp < end``.
+
+    Binary-searches the index for the block holding ``start`` (starting one
+    block early, as entries from different threads may be a little out of
+    order) and reads from there until the first entry at or after ``end``.
+    Bounds compare as strings, so ISO prefixes like ``2025-08-01T14`` work.
+    """
+    timestamps, offsets = load_index(segment)
+    if not offsets or (end is not None and timestamps[0] >= end):
+        return
+    i = max(0, bisect_left(timestamps, start) - 1) if start else 0
+    with open(segment, 'rb') as f:
+        f.seek(offsets[i])
+        for raw in f:
+            if not raw.endswith(b'\n'):
+                return  # an append in progress
+            line = raw[:-1].decode('utf-8', 'replace')
+            ts = entry_timestamp(line)
+            if end is not None and ts >= end:
+                return
+            if start is None or ts >= start:
+                yield line
+
+
+def query(path, start=None, end=None):
+    """Entries of ``path`` and all its shards with ``start <= timestamp < end``, in time order"""
+    sources = [path] + list(find_shards(path).values())
+    streams = [chain.from_iterable(iter_range(segment, start, end) for segment in segment_paths(source))
+               for source in sources]
+    return heapq.merge(*streams, key=entry_timestamp)
+
+
+class UsageLog:
+    """Append-only usage log kept in rotated segments.
+
+    The newest entries live in ``path``; full segments are shifted to
+    ``path.1`` .. ``path.N`` logrotate-style and the oldest one is dropped,
+    so an append never rewrites existing entries.  Each segment has a sparse
+    time index (``<segment>.idx``) with the timestamp and byte offset of every
+    ``index_block``-th entry, appended as entries are written and rebuilt on
+    open if missing.
+    """
+
+    def __init__(self, path, max_entries, segment_entries=10000, index_block=INDEX_BLOCK):
+        self.path = path
+        self.max_entries = max_entries
+        self.segment_entries = max(1, min(segment_entries, max_entries))
+        self.index_block = index_block
+        # Enough full segments behind the active one to always hold max_entries
+        self.max_segments = -(-max_entries // self.segment_entries)
+        self._file = None
+        self._index = None
+        self._count = 0
+        self._size = 0
+        self._lock = threading.Lock()
+
+    def _open(self):
+        for segment in self.segments():
+            load_index(segment, self.index_block, write=True)
+        self._count = 0
+        self._size = 0
+        if os.path.exists(self.path):
+            with open(self.path, 'rb') as f:
+                for raw in f:
+                    self._count += 1
+                    self._size += len(raw)
+        self._file = open(self.path, 'a', encoding='utf-8')
+        self._index = open(index_path(self.path), 'a', encoding='utf-8')
+
+    def _rotate(self):
+        self._file.close()
+        self._index.close()
+        remove_segment(f"{self.path}.{self.max_segments}")
+        for i in range(self.max_segments - 1, 0, -1):
+            src = f"{self.path}.{i}"
+            if os.path.exists(src):
+                os.replace(src, f"{self.path}.{i + 1}")
+                if os.path.exists(index_path(src)):
+                    os.replace(index_path(src), index_path(f"{self.path}.{i + 1}"))
+        os.replace(self.path, f"{self.path}.1")
+        os.replace(index_path(self.path), index_path(f"{self.path}.1"))
+        self._file = open(self.path, 'a', encoding='utf-8')
+        self._index = open(index_path(self.path), 'a', encoding='utf-8')
+        self._count = 0
+        self._size = 0
+
+    def append(self, line):
+        """Append one entry (without trailing newline) in O(1)"""
+        self.append_many([line])
+
+    def append_many(self, lines):
+        """Append several entries with a single flush"""
+        with self._lock:
+            if self._file is None:
+                self._open()
+            for line in lines:
+                if self._count >= self.segment_entries:
+                    self._file.flush()
+                    self._rotate()
+                if self._count % self.index_block == 0:
+                    self._index.write(f"{entry_timestamp(line)} {self._size}\n")
+                self._file.write(line + '\n')
+                self._count += 1
+                self._size += len(line.encode('utf-8')) + 1
+            self._file.flush()
+            self._index.flush()
+
+    write = append_many
+
+    def open(self):
+        """Open the active segment now rather than on the first append"""
+        with self._lock:
+            if self._file is None:
+                self._open()
+
+    def flush(self):
+        """Entries are flushed on every append; nothing is buffered"""
+
+    def bytes_used(self):
+        """Bytes held on disk by all segments"""
+        return sum(os.path.getsize(p) for p in self.segments())
+
+    def segments(self):
+        """Existing segment paths, oldest first"""
+        paths = [f"{self.path}.{i}" for i in range(self.max_segments, 0, -1)]
+        paths.append(self.path)
+        return [p for p in paths if os.path.exists(p)]
+
+    def tail(self, n=None):
+        """Return the last ``n`` entries (default: the retained window) in order"""
+        n = self.max_entries if n is None else min(n, self.max_entries)
+        if n <= 0:
+            return []
+        with self._lock:
+            if self._file is not None:
+                self._file.flush()
+        collected = deque()
+        for path in reversed(self.segments()):
+            with open(path, 'r', encoding='utf-8') as f:
+                lines = f.read().splitlines()
+            collected.extendleft(reversed(lines[-(n - len(collected)):]))
+            if len(collected) >= n:
+                break
+        return list(collected)
+
+    def close(self):
+        with self._lock:
+            if self._file is not None:
+                self._file.close()
+                self._index.close()
+                self._file = None
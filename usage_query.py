@@ -0,0 +1,67 @@
+"""Time-range queries over the usage log and all worker shards.
+
+Each usage segment has a sparse ``.idx`` sidecar (timestamp and byte offset
+of every 256th entry), so a query binary-searches to the first block of the
+range and reads only the entries in it; shards are merged in time order.
+
+    python usage_query.py --start 2025-08-01T14:00 --end 2025-08-01T15:00
+    python usage_query.py --start 2025-08-01 --limit 20 --json
+    python usage_query.py --rebuild-index    # shards of running workers are left to them
+    python usage_query.py --check-index      # list missing or stale indexes; exit 1 if any
+"""
+import argparse
+import json
+import os
+import sys
+from itertools import islice
+
+from usage_log import build_index, find_shards, pid_alive, query, segment_paths, stored_index
+
+LOG_DIR = 'log'
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split('\n', 1)[0])
+    parser.add_argument('--log-dir', default=LOG_DIR)
+    parser.add_argument('--start', help='first timestamp to include (ISO prefix, e.g. 2025-08-01T14:00)')
+    parser.add_argument('--end', help='timestamp to stop before (ISO prefix)')
+    parser.add_argument('--limit', type=int, default=0, help='stop after this many entries (0 for all)')
+    parser.add_argument('--json', action='store_true', help='print entries as JSON lines')
+    parser.add_argument('--rebuild-index', action='store_true',
+                        help='rebuild the segment indexes of the base log and of exited workers, and exit')
+    parser.add_argument('--check-index', action='store_true',
+                        help='report segments whose index is missing or stale, without changing anything')
+    args = parser.parse_args(argv)
+
+    base = os.path.join(args.log_dir, 'usage.log')
+    if args.check_index:
+        segments = [s for source in [base] + list(find_shards(base).values()) for s in segment_paths(source)]
+        stale = [segment for segment in segments if stored_index(segment) is None]
+        for segment in stale:
+            print(segment)
+        print(f"{len(stale)} of {len(segments)} indexes missing or stale", file=sys.stderr)
+        return 1 if stale else 0
+    if args.rebuild_index:
+        # A running worker owns its shard's indexes and rebuilds them itself on open
+        shards = find_shards(base)
+        sources = [base] + [path for sid, path in shards.items() if not pid_alive(sid)]
+        segments = [s for source in sources for s in segment_paths(source)]
+        for segment in segments:
+            build_index(segment)
+        skipped = len(shards) - (len(sources) - 1)
+        print(f"Rebuilt {len(segments)} indexes; skipped {skipped} shards of running workers", file=sys.stderr)
+        return 0
+
+    entries = query(base, args.start, args.end)
+    if args.limit:
+        entries = islice(entries, args.limit)
+    for line in entries:
+        if args.json:
+            timestamp, _, birthdate = line.partition(' | ')
+            line = json.dumps({'timestamp': timestamp, 'birthdate': birthdate})
+        sys.stdout.write(line + '\n')
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())